@@ -0,0 +1,49 @@
+"""
+Compares the exponential ETDRK4 integrator against the fixed-step RK4 reference:
+max output error on the shared grid and wall time, for a few macro-step strides.
+"""
+
+import time
+import numpy as np
+from _prnn.reservoir import Reservoir
+from _utils import inputs
+
+T = 4000
+STRIDES = [2, 5, 10, 20]
+
+
+def drive(res):
+    """Input pattern for a preset: high/low permutations for gates, zero otherwise."""
+    k = res.B.shape[1]
+    if np.all(res.B == 0):
+        return np.zeros((k, T))
+    pattern = inputs.high_low_inputs(T)
+    return np.vstack([pattern] * k)[:k]
+
+
+for name in ["lorenz", "nand", "nor_triple"]:
+    pattern = drive(Reservoir.load(name))
+
+    start = time.perf_counter()
+    ref = Reservoir.load(name).run(pattern)
+    t_ref = time.perf_counter() - start
+    print(f"{name}: rk4 {t_ref * 1e3:.1f} ms")
+
+    for stride in STRIDES:
+        res = Reservoir.load(name)
+        start = time.perf_counter()
+        try:
+            out = res.run(pattern, method="etdrk4", stride=stride)
+        except ValueError as e:
+            print(f"  etdrk4 stride {stride:2d}: rejected, {e}")
+            continue
+        t_etd = time.perf_counter() - start
+
+        err = np.abs(out - ref[:, ::stride]).max(axis=0)
+        # lorenz is chaotic, so pointwise errors only mean something early on
+        early = err[: 500 // stride].max()
+        print(
+            f"  etdrk4 stride {stride:2d}: {t_etd * 1e3:6.1f} ms "
+            f"({t_ref / t_etd:4.1f}x), max err {err.max():.2e}, "
+            f"first 500 steps {early:.2e}"
+        )
@@ -0,0 +1,46 @@
+"""
+Tracks the import cost of the public entry points with python -X importtime:
+cumulative time per module, its heaviest dependencies, and which of the heavy
+optional dependencies (loaded only by solve, compile or draw) slipped in.
+"""
+
+import os
+import subprocess
+import sys
+
+MODULES = ["pyres", "_prnn.reservoir"]
+HEAVY = ["matlab", "sympy", "scipy", "networkx", "matplotlib"]
+REPEATS = 5
+TOP = 8
+
+
+def importtime(module):
+    """(total us, {package: cumulative us}) of importing module in a fresh process."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=os.environ,
+        check=True,
+    )
+    cumulative = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cum, name = line[len("import time:") :].split("|")
+        cumulative[name.strip()] = int(cum)
+    return cumulative[module], cumulative
+
+
+for module in MODULES:
+    # the best of a few runs, as the first one also pays for a cold disk cache
+    runs = [importtime(module) for _ in range(REPEATS)]
+    total, cumulative = min(runs, key=lambda run: run[0])
+    print(f"{module}: {total / 1e3:.1f} ms")
+
+    top_level = {k: v for k, v in cumulative.items() if "." not in k and k != module}
+    for name, us in sorted(top_level.items(), key=lambda kv: -kv[1])[:TOP]:
+        print(f"    {name:<24} {us / 1e3:8.1f} ms")
+
+    loaded = [h for h in HEAVY if h in cumulative]
+    print(f"    heavy dependencies loaded: {', '.join(loaded) or 'none'}")
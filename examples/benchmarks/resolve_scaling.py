@@ -0,0 +1,34 @@
+"""
+Resolve time of synthetic circuits from 10 to 10,000 reservoirs: a chain of nand
+gates, o_i = NAND(o_{i-1}, i_i), compiled to a CGraph and resolved with the
+default ("auto") composite format.
+"""
+
+import sys
+import time
+import scipy.sparse  # imported by the first sparse composite; kept out of the timings
+from _cgraph.resolve import Resolver
+from ir.core import Core, Expr, Opc
+from ir.lang import Prog
+
+SIZES = [10, 100, 1000, 10000]
+
+
+def nand_chain_graph(n):
+    names = [f"i{i}" for i in range(n + 1)]
+    exprs = [Expr(Opc.INPUT, [names]), Expr(Opc.LET, [["o0"], Expr("NAND", names[:2])])]
+    for i in range(1, n):
+        exprs.append(
+            Expr(Opc.LET, [[f"o{i}"], Expr("NAND", [f"o{i-1}", names[i + 1]])])
+        )
+    exprs.append(Expr(Opc.RET, [[f"o{n - 1}"]]))
+    return Core(Prog(exprs)).compile_to_cgraph()
+
+
+sizes = [int(n) for n in sys.argv[1:]] or SIZES
+for n in sizes:
+    graph = nand_chain_graph(n)
+    start = time.perf_counter()
+    res = Resolver(graph).resolve()
+    elapsed = time.perf_counter() - start
+    print(f"{n:>6} reservoirs: {elapsed * 1e3:10.1f} ms  ({res.A.shape[0]} neurons)")
@@ -11,6 +11,7 @@ setup(
         "matlabengine==24.1.2",
         "matplotlib==3.9.2",
         "numpy==2.1.1",
+        "scipy==1.14.1",
         "sympy==1.13.1",
         "networkx==3.3",
     ],
@@ -1,7 +1,6 @@
 """ Graph class; target of IR core compiler """
 
 import networkx as nx
-import matplotlib.pyplot as plt
 from _prnn.reservoir import Reservoir
 from typing import Any, Dict
 
@@ -104,14 +103,16 @@ class CGraph:
         """Adds a variable node to the graph."""
         self.add_node(name, "var")
 
-    def add_reservoir(self, name: str, reservoir: Reservoir):
+    def add_reservoir(self, name: str, reservoir: Reservoir, fn: str = None):
         """
         Adds a reservoir node to the graph.
         Args:
             name (str): The reservoir's name.
             reservoir (Reservoir): The reservoir object associated with this node.
+            fn (str, optional): The function or preset the reservoir computes;
+                nodes with the same fn and arguments are merged by optimize.
         """
-        self.add_node(name, "reservoir", reservoir=reservoir)
+        self.add_node(name, "reservoir", reservoir=reservoir, fn=fn)
 
     def add_output(self, name: str):
         """Adds an output node to the graph."""
@@ -213,6 +214,9 @@ class CGraph:
         return self.graph.is_directed()
 
     def draw(self):
+        # matplotlib is only needed here, so it is not imported with the module
+        import matplotlib.pyplot as plt
+
         # Define node and edge colors
         node_color = "lightblue"
         edge_color = "gray"
@@ -263,12 +267,13 @@ class CGraph:
         plt.tight_layout(pad=2)  # Adjust layout for better spacing
         plt.show()
 
-    def validate(self):
+    def validate(self, allow_unused=False):
         """
         Validates the structure of the graph by ensuring:
         - Input nodes have exactly one output.
         - Output nodes have exactly one input.
-        - Variable nodes have exactly one input and one output.
+        - Variable nodes have exactly one input and one output (or none, with
+          allow_unused, for graphs that go through optimize.eliminate_dead).
         - Reservoir nodes maintain valid input/output indices.
         """
         for node, data in self.graph.nodes(data=True):
@@ -294,7 +299,9 @@ class CGraph:
                     raise ValueError(
                         f"Variable node {node} must have exactly one input."
                     )
-                if self.graph.out_degree(node) != 1:
+                if self.graph.out_degree(node) != 1 and not (
+                    allow_unused and self.graph.out_degree(node) == 0
+                ):
                     raise ValueError(
                         f"Variable node {node} must have exactly one output."
                     )
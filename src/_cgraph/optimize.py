@@ -0,0 +1,164 @@
+""" Optimization passes over a CGraph, run before it is resolved """
+
+import numpy as np
+from _cgraph.cgraph import CGraph
+from _prnn import operators
+
+"""
+A node is live if a return or output node depends on it. Everything else is
+simulated for nothing once the graph is resolved, so eliminate_dead removes it:
+reservoirs none of whose outputs reach a return, the inputs and constants that
+only fed them, and the variables they wrote. Live reservoirs lose the rows of W
+that no longer feed anything, with the output_idx of their edges renumbered.
+
+merge_common is common subexpression elimination: reservoir nodes calling the
+same function (their "fn" attribute) on the same sources are merged into one,
+which then feeds the variables of all of them. Sources compare by value for
+constants and by (reservoir, output_idx) for variables, so merging repeats
+until the merges it enables downstream are done too. Two edges reading the same
+output get a row of W each when the graph is resolved.
+"""
+
+
+def _reservoir_nodes(graph: CGraph):
+    nodes = graph.all_nodes()
+    return [n for n in nodes if nodes[n]["type"] == "reservoir"]
+
+
+def live_nodes(graph: CGraph, keep_inputs=True) -> set:
+    """
+    Nodes a return or output depends on. With keep_inputs, argument inputs
+    (inputs without a value) and the reservoirs they feed are live too, so the
+    resolved reservoir keeps its signature.
+    """
+    g = graph.get_graph()
+    seeds = [n for n, t in g.nodes(data="type") if t in ("return", "output")]
+    if keep_inputs:
+        for n, data in g.nodes(data=True):
+            if data["type"] == "input" and data.get("value") is None:
+                seeds.append(n)
+                seeds.extend(g.successors(n))
+
+    live = set(seeds)
+    stack = list(seeds)
+    while stack:
+        for pred in g.predecessors(stack.pop()):
+            if pred not in live:
+                live.add(pred)
+                stack.append(pred)
+    return live
+
+
+def _drop_unused_outputs(graph: CGraph, name: str) -> int:
+    """Removes the rows of W no edge of reservoir name reads; returns their number."""
+    g = graph.get_graph()
+    res = g.nodes[name]["reservoir"]
+    out_edges = [g.edges[name, succ] for succ in g.successors(name)]
+    used = sorted({e["output_idx"] for e in out_edges})
+    n_out = res.W.shape[0]
+    if len(used) == n_out:
+        return 0
+
+    # a new W, as reservoirs may share read-only preset arrays
+    res.W = operators.delete(res.W, np.setdiff1d(np.arange(n_out), used), axis=0)
+    rank = {idx: i for i, idx in enumerate(used)}
+    for e in out_edges:
+        e["output_idx"] = rank[e["output_idx"]]
+    return n_out - len(used)
+
+
+def _source_key(graph: CGraph, name: str):
+    g = graph.get_graph()
+    data = g.nodes[name]
+    if data["type"] == "input" and data.get("value") is not None:
+        return ("const", data["value"])
+    preds = list(g.predecessors(name))
+    if data["type"] == "var" and len(preds) == 1:
+        return ("out", preds[0], g.edges[preds[0], name]["output_idx"])
+    return ("node", name)
+
+
+def _call_key(graph: CGraph, name: str):
+    """What reservoir node name computes, or None if it cannot be compared."""
+    g = graph.get_graph()
+    fn = g.nodes[name].get("fn")
+    if fn is None:
+        return None
+    args = sorted(
+        (g.edges[src, name]["input_idx"], _source_key(graph, src))
+        for src in g.predecessors(name)
+    )
+    return (fn, tuple(args))
+
+
+def _merge_into(graph: CGraph, keep: str, dup: str):
+    """Moves the outputs of reservoir dup to keep and removes dup with its arguments."""
+    g = graph.get_graph()
+    for succ in list(g.successors(dup)):
+        g.add_edge(keep, succ, **g.edges[dup, succ])
+
+    # arguments only dup read compute the same as keep's, so they go with it
+    args = [src for src in g.predecessors(dup) if g.out_degree(src) == 1]
+    g.remove_node(dup)
+    for src in args:
+        if g.nodes[src]["type"] in ("input", "var"):
+            g.remove_node(src)
+
+
+def merge_common(graph: CGraph) -> dict:
+    """
+    Merges structurally identical reservoir nodes of graph, in place.
+
+    Returns:
+        counts of the removed reservoirs and, for those with a reservoir
+        attached, their neurons.
+    """
+    g = graph.get_graph()
+    report = {"reservoirs": 0, "neurons": 0}
+    merged = True
+    while merged:
+        merged = False
+        seen = {}
+        for name in _reservoir_nodes(graph):
+            key = _call_key(graph, name)
+            if key is None:
+                continue
+            if key not in seen:
+                seen[key] = name
+                continue
+
+            res = g.nodes[name].get("reservoir")
+            report["reservoirs"] += 1
+            report["neurons"] += res.A.shape[0] if res is not None else 0
+            _merge_into(graph, seen[key], name)
+            merged = True
+    return report
+
+
+def eliminate_dead(graph: CGraph, keep_inputs=True) -> dict:
+    """
+    Removes the nodes of graph no return or output depends on, in place (see
+    live_nodes), and the outputs of live reservoirs that feed nothing.
+
+    Returns:
+        counts of the removed reservoirs, inputs, reservoir outputs and neurons.
+    """
+    g = graph.get_graph()
+    live = live_nodes(graph, keep_inputs)
+    dead = [n for n in g.nodes if n not in live]
+
+    report = {"reservoirs": 0, "inputs": 0, "outputs": 0, "neurons": 0}
+    for n in dead:
+        data = g.nodes[n]
+        if data["type"] == "reservoir":
+            report["reservoirs"] += 1
+            if data.get("reservoir") is not None:
+                report["neurons"] += data["reservoir"].A.shape[0]
+        elif data["type"] == "input":
+            report["inputs"] += 1
+    g.remove_nodes_from(dead)
+
+    for name in _reservoir_nodes(graph):
+        if g.nodes[name].get("reservoir") is not None:
+            report["outputs"] += _drop_unused_outputs(graph, name)
+    return report
@@ -5,20 +5,35 @@ from collections import OrderedDict
 import numpy as np
 from _cgraph.cgraph import CGraph
 from _prnn.reservoir import Reservoir
+from _prnn import operators, reduce
+from _cgraph import optimize as passes
 
 
 class Resolver:
     """
     Resolves an CGraph into a Reservoir
+    * a_format: storage of the composite A, B and W: "dense", "sparse" (CSR),
+    "lowrank" (A as an operators.BlockLowRank, B and W CSR) or "auto", which
+    goes sparse once A is at most operators.SPARSE_FILL full
+    * optimize: merges identical calls and removes the parts of the graph no
+    return depends on before resolving (see _cgraph.optimize), and the neurons
+    no readout depends on after; self.report then holds what each pass removed
     """
 
-    def __init__(self, cgraph: CGraph, verbose=False):
+    def __init__(self, cgraph: CGraph, verbose=False, a_format="auto", optimize=False):
         self.graph = cgraph
         self.reservoir: Reservoir = None  # map of constituent reservoirs to idx in A
         self.res_idx_map = OrderedDict()
         self.verbose = verbose
+        self.a_format = a_format
+        self.optimize = optimize
+        self.report = {}
 
     def resolve(self) -> Reservoir:
+        if self.optimize:
+            self.report["cse"] = passes.merge_common(self.graph)
+            self.report["graph"] = passes.eliminate_dead(self.graph)
+        self._fan_out_outputs()
         self._track_inp_out()
         dim = self._get_reservoirs()
         a = self._gen_composite_adjacency(dim)
@@ -26,6 +41,10 @@ class Resolver:
         self._combine_reservoirs(a)
         self._remove_ignored_inputs()
         self._internalize_constant_inputs()
+        if self.optimize:
+            self._remove_unobservable()
+        if self.verbose and self.report:
+            print(f"resolver: optimization passes removed {self.report}")
         return self.reservoir
 
     def _get_reservoirs(self) -> int:
@@ -46,6 +65,28 @@ class Resolver:
                 idx += reservoir.A.shape[0]
         return dim
 
+    def _fan_out_outputs(self):
+        """
+        Reorders the rows of each reservoir's W to follow its out-edges, which
+        _track_inp_out names in edge order, giving every edge reading a shared
+        output its own row. Merged calls and dead-code elimination both leave
+        edges whose output_idx is out of order.
+        """
+        g = self.graph.get_graph()
+        for name in self.graph.all_nodes():
+            node = self.graph.get_node(name)
+            if node["type"] != "reservoir":
+                continue
+            edges = [g.edges[name, succ] for succ in g.successors(name)]
+            idx = [e["output_idx"] for e in edges]
+            if idx == list(range(len(idx))):
+                continue
+
+            res: Reservoir = node["reservoir"]
+            res.W = operators.submatrix(res.W, idx, np.arange(res.W.shape[1]))
+            for i, e in enumerate(edges):
+                e["output_idx"] = i
+
     def _track_inp_out(self):
         # Initialize input_names and output_names for each reservoir
         for node_name in self.graph.all_nodes():
@@ -67,20 +108,25 @@ class Resolver:
             if dst_node["type"] == "reservoir":
                 dst_node["reservoir"].input_names.append(src)
 
-    def _gen_composite_adjacency(self, dim) -> np.ndarray:
+    def _gen_composite_adjacency(self, dim) -> operators.CompositeBuilder:
         """
         Generates a composite reservoir from the CGraph.
         Returns:
-        * a: combined adjacency matrix
+        * a: builder of the combined adjacency, assembled once all
+        connections are added
         """
-        a = np.zeros((dim, dim))
+        a = operators.CompositeBuilder(dim)
         for r, idx in self.res_idx_map.items():
             r: Reservoir
-            sz = r.A.shape[0]
-            a[idx : idx + sz, idx : idx + sz] = r.A
+            a.add_reservoir(idx, r.A)
         return a
 
     def _process_connections(self, a):
+        # internalized inputs and outputs of each reservoir, removed at the end
+        # in one selection; indices refer to the untouched B and W
+        used_inputs = {res: [] for res in self.res_idx_map}
+        used_outputs = {res: [] for res in self.res_idx_map}
+
         for var in self.graph.all_nodes():
             node = self.graph.get_node(var)
             if node["type"] != "var":
@@ -92,21 +138,24 @@ class Resolver:
             tar_res_idx = tar_res.input_names.index(var)
 
             # Internalized section of A
-            w_row = src_res.W[src_res_idx, :].reshape(1, -1)
-            b_col = tar_res.B[:, tar_res_idx].reshape(-1, 1)
-            sec = np.outer(b_col, w_row)
+            w_row = operators.toarray(src_res.W[[src_res_idx], :])
+            b_col = operators.toarray(tar_res.B[:, [tar_res_idx]])
             out_pos = self.res_idx_map[src_res]
             in_pos = self.res_idx_map[tar_res]
-            sec_rows, sec_cols = sec.shape
-            a[in_pos : in_pos + sec_rows, out_pos : out_pos + sec_cols] += sec
+            a.add_coupling(in_pos, b_col, out_pos, w_row)
 
-            # cleanup removed connection
-            self._remove_res_input(tar_res, tar_res_idx)
-            self._remove_res_output(src_res, src_res_idx)
+            used_inputs[tar_res].append(tar_res_idx)
+            used_outputs[src_res].append(src_res_idx)
 
-            # cleanup removed connection
-            src_res.output_names.remove(var)
-            tar_res.input_names.remove(var)
+        # cleanup removed connections
+        for res in self.res_idx_map:
+            inputs, outputs = used_inputs[res], used_outputs[res]
+            self._remove_res_inputs(res, inputs)
+            self._remove_res_outputs(res, outputs)
+            res.input_names = [n for i, n in enumerate(res.input_names) if i not in inputs]
+            res.output_names = [
+                n for i, n in enumerate(res.output_names) if i not in outputs
+            ]
 
         return a
 
@@ -116,70 +165,23 @@ class Resolver:
         on their respective diagonals. Also stacks x_init, r_init, and d
         components for each reservoir. Returns a new combined Reservoir.
         """
-        # Initialize empty arrays for stacking and diagonal placement
-        x_all = np.zeros((0, 1))
-        r_init_all = np.zeros((0, 1))
-        d_all = np.zeros((0, 1))
-        b_comb = np.zeros((0, 0))
-        w_comb = np.zeros((0, 0))
-        input_names = []
-        output_names = []
-
-        # Track the current row and column indices for placing the next matrix
-        b_row, b_col, w_row, w_col = 0, 0, 0, 0
-
-        for res in self.res_idx_map.keys():
-            res: Reservoir
-            b, w = res.B, res.W
-            b_r, b_c = b.shape
-            w_r, w_c = w.shape
-
-            # Resize B and W arrays to fit the new matrices
-            b_comb = (
-                np.pad(b_comb, ((0, b_r), (0, b_c)), mode="constant")
-                if b_comb.size
-                else np.zeros((b_row + b_r, b_col + b_c))
-            )
-            w_comb = (
-                np.pad(w_comb, ((0, w_r), (0, w_c)), mode="constant")
-                if w_comb.size
-                else np.zeros((w_row + w_r, w_col + w_c))
-            )
-
-            # Place the matrices B and W on their respective diagonals
-            b_comb[b_row : b_row + b_r, b_col : b_col + b_c] = b
-            w_comb[w_row : w_row + w_r, w_col : w_col + w_c] = w
-
-            # Update row and column indices
-            b_row, b_col = b_row + b_r, b_col + b_c
-            w_row, w_col = w_row + w_r, w_col + w_c
-
-            # Stack x_init, r_init, and d
-            x_all = np.vstack([x_all, res.x_init])
-            r_init_all = np.vstack([r_init_all, res.r_init])
-            d_all = np.vstack([d_all, res.d])
-
-            # Update input and output names
-            for name in res.input_names:
-                input_names.append(name)
-
-            for name in res.output_names:
-                output_names.append(name)
-
-            """ # Create and return a new combined Reservoir
-            self.reservoir = Reservoir(
-                A=res.A,
-                B=res.B,
-                W=res.W,
-                x_init=res.x_init,
-                r_init=res.r_init,
-                # r=r_all,
-                d=res.d,
-                global_timescale=0.001,
-                gamma=100,
-                input_names=input_names,
-                output_names=output_names,
-            ) """
+        # A picks the storage format, B and W follow it
+        a = a.assemble(self.a_format)
+        fmt = "dense" if operators.isdense(a) else "sparse"
+        reservoirs = list(self.res_idx_map.keys())
+        b_comb = operators.block_diag([res.B for res in reservoirs], fmt)
+        w_comb = operators.block_diag([res.W for res in reservoirs], fmt)
+
+        # Stack x_init, r_init, and d in one pass each
+        x_all = np.concatenate([np.zeros((0, 1))] + [r.x_init for r in reservoirs])
+        r_init_all = np.concatenate(
+            [np.zeros((0, 1))] + [r.r_init for r in reservoirs]
+        )
+        d_all = np.concatenate([np.zeros((0, 1))] + [r.d for r in reservoirs])
+
+        # Update input and output names
+        input_names = [name for r in reservoirs for name in r.input_names]
+        output_names = [name for r in reservoirs for name in r.output_names]
 
         # Create and return a new combined Reservoir
         self.reservoir = Reservoir(
@@ -202,38 +204,43 @@ class Resolver:
         """
         Removes columns in B that correspond to zero entries in x_init for the combined reservoir.
         """
-        for i in reversed(range(self.reservoir.B.shape[1])):
-            # Check if all elements in column i are zeros
-            if np.all(self.reservoir.B[:, i] == 0):
-                self._remove_res_input(self.reservoir, i)
+        col_nnz = operators.toarray(abs(self.reservoir.B).sum(axis=0)).reshape(-1)
+        self._remove_res_inputs(self.reservoir, np.flatnonzero(col_nnz == 0))
 
     def _internalize_constant_inputs(self):
-        inp_names = self.reservoir.input_names.copy()
-
-        # reverse to avoid index shifting
-        for idx, inp_name in reversed(list(enumerate(inp_names))):
-            node = self.graph.get_node(inp_name)
-            if node["value"] is not None:
-                b_col = self.reservoir.B[:, idx].reshape(-1, 1)
-                self.reservoir.d += b_col * node["value"]
-                self._remove_res_input(self.reservoir, idx)
+        constants = [
+            (idx, node["value"])
+            for idx, node in enumerate(map(self.graph.get_node, self.reservoir.input_names))
+            if node["value"] is not None
+        ]
+        if not constants:
+            return
+
+        idx, values = (list(t) for t in zip(*constants))
+        b_cols = operators.toarray(self.reservoir.B[:, idx])
+        # a new d, as constituents may share read-only preset arrays
+        self.reservoir.d = self.reservoir.d + b_cols @ np.reshape(values, (-1, 1))
+        self._remove_res_inputs(self.reservoir, idx)
+
+    def _remove_unobservable(self):
+        self.reservoir, removed = reduce.remove_unobservable(self.reservoir)
+        self.report["unobservable"] = {"neurons": removed}
 
     @staticmethod
-    def _remove_res_input(res: Reservoir, idx: int):
-        if res.B.shape[1] > 1:
-            res.B = np.delete(res.B, idx, axis=1)
-        else:
-            res.B = np.zeros_like(res.B)
-
-        if res.x_init.shape[0] > 1:
+    def _remove_res_inputs(res: Reservoir, idx):
+        """Removes inputs idx of res in one selection, leaving one zero column if none remain."""
+        if len(idx) == 0:
+            return
+        if len(set(idx)) < res.B.shape[1]:
+            res.B = operators.delete(res.B, idx, axis=1)
             res.x_init = np.delete(res.x_init, idx, axis=0)
         else:
+            res.B = operators.zeros((res.B.shape[0], 1), like=res.B)
             res.x_init = np.zeros((1, res.x_init.shape[1]))
 
     @staticmethod
-    def _remove_res_output(res: Reservoir, idx: int):
-        res.W = (
-            np.delete(res.W, idx, axis=0)
-            if res.W.shape[0] > 1
-            else np.zeros((0, res.A.shape[0]))
-        )
+    def _remove_res_outputs(res: Reservoir, idx):
+        """Removes outputs idx of res in one selection."""
+        if len(idx) == 0:
+            return
+        res.W = operators.delete(res.W, idx, axis=0)
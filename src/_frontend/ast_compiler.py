@@ -1,10 +1,15 @@
 import ast
+import graphlib
 import re
 import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from typing import List, Tuple, NewType
 from _cgraph.cgraph import CGraph
 from _prnn.reservoir import Reservoir
+from _prnn import presets
+from _frontend import build_cache as builds
 from _cgraph.resolve import Resolver
+from _cgraph import optimize as passes
 from _std.std import registry
 
 from typing import Union
@@ -12,6 +17,15 @@ from typing import Union
 cvec = NewType("cvec", List[Union[float, str, None]])
 
 
+def _resolve_graph(graph: CGraph, optimize=False) -> Tuple[Reservoir, dict]:
+    """
+    (reservoir, optimization report). Module-level, so resolutions can run in
+    worker processes.
+    """
+    resolver = Resolver(graph, optimize=optimize)
+    return resolver.resolve(), resolver.report
+
+
 class FnInfo:
     def __init__(self):
         self.res: Reservoir = None
@@ -24,7 +38,25 @@ class FnInfo:
 
 
 class ASTCompiler(ast.NodeVisitor):
-    def __init__(self, verbose=False, track_time=False, file=None):
+    def __init__(
+        self,
+        verbose=False,
+        track_time=False,
+        file=None,
+        build_cache=None,
+        workers=1,
+        optimize=False,
+    ):
+        """
+        build_cache: a SolveCache directory for resolved functions (see
+        _frontend.build_cache), True for the default one, or None to resolve
+        every function from scratch.
+        workers: processes resolving independent functions concurrently; 1
+        resolves them one at a time in this process, None uses every core.
+        optimize: merges calls of the same function on the same arguments and
+        drops reservoirs, outputs and neurons no return depends on (see
+        Resolver); repeated arguments and unused variables are then allowed.
+        """
         self.uid_ct = 0
         self.file = file
         self.funcs: dict[str, FnInfo] = {}
@@ -34,6 +66,14 @@ class ASTCompiler(ast.NodeVisitor):
         self.time_data = {}
         # Per function
         self.curr_fn: str = None
+        self.build_cache = (
+            builds.default_build_cache() if build_cache is True else build_cache
+        )
+        self.build_stats = {"hits": 0, "misses": 0}
+        self.workers = workers
+        self.optimize = optimize
+        self.opt_reports = {}  # fn -> Resolver.report, for functions resolved here
+        self.cse_reports = {}  # fn -> optimize.merge_common report
 
     def compile(self, prog_ast: ast.Module) -> Reservoir:
         """Takes source code and attempts to resolve it to a reservoir.
@@ -55,7 +95,10 @@ class ASTCompiler(ast.NodeVisitor):
             self._end_timer("traverse ast")
 
         for fn in self.funcs:
-            self.funcs[fn].graph.validate()
+            # merged calls read their arguments once, so merge before validating
+            if self.optimize:
+                self.cse_reports[fn] = passes.merge_common(self.funcs[fn].graph)
+            self.funcs[fn].graph.validate(allow_unused=self.optimize)
 
         # print graphs
         if self.verbose:
@@ -65,88 +108,31 @@ class ASTCompiler(ast.NodeVisitor):
                 graph.draw()
                 graph.print()
 
-        if self.track_time:
-            self._start_timer("global resolution loop")
-
-        # resolve every function's cgraph to a reservoir
-        made_resolution = True
-        while made_resolution:
-            made_resolution = False
+        # functions unchanged since an earlier build skip resolution entirely
+        self.fn_keys = {}
+        if self.build_cache is not None:
+            self.fn_keys = builds.function_keys(prog_ast, optimize=self.optimize)
             for fn in self.funcs:
-                if self.funcs[fn].res is not None:
-                    continue
-
-                if self.verbose:
-                    print(f"ATTEMPTING TO RESOLVE {fn}")
-
-                unresolved_res_ct = 0
-                for node_name in self.funcs[fn].graph.all_nodes():
-                    fn_name = self.strip_uid(node_name)
-                    node = self.funcs[fn].graph.get_node(node_name)
-                    if node["type"] != "reservoir":
-                        continue
+                self._load_built(fn, self.fn_keys[fn])
 
-                    if node["reservoir"] is None:
-                        # check in stdlib
-                        if fn_name in registry:
-                            if self.verbose:
-                                print(f"res loop: found {fn_name} in registry")
-
-                            node["reservoir"] = Reservoir.load(registry[fn_name].path)
-                            res = node["reservoir"]
-                            res: Reservoir
-
-                            # give placeholder names if none
-                            if res.name == []:
-                                res.name = fn_name
-                            if res.output_names == []:
-                                for i in range(res.W.shape[0]):
-                                    res.output_names.append(f"{fn_name}_o{i}")
-                            if res.input_names == []:
-                                for i in range(res.x_init.shape[0]):
-                                    res.input_names.append(f"{fn_name}_o{i}")
-
-                            made_resolution = True
-                        # check in program defined fns
-                        elif fn_name in self.funcs.keys():
-                            if self.verbose:
-                                print(f"res loop: found {fn_name} in compiled fns")
-                            res = self.funcs[fn_name].res
-                            if res is not None:
-                                node["reservoir"] = res.copy()  # to avoid overwrites
-                                made_resolution = True
-                            else:
-                                unresolved_res_ct += 1
-                        else:
-                            unresolved_res_ct += 1
-
-                # If all constituent reservoirs in the graph have been resovled, resolve the graph
-                if unresolved_res_ct == 0:
-                    self.funcs[fn].graph
-
-                    if self.track_time:
-                        self._start_timer(f"resolve {fn}")
-
-                    self.funcs[fn].res = Resolver(self.funcs[fn].graph).resolve()
-
-                    # if self.verbose:
-                    #     print(f"reservoir resolved: {fn}")
-                    #     self.funcs[fn].res.print()
-
-                    if self.track_time:
-                        self._end_timer(f"resolve {fn}")
-
-                    # TODO: make name tracking entirely graph based
-                    if self.verbose:
-                        print(f"Solved fn {fn} inputs: ", self.funcs[fn].inputs)
-                        print(f"Solved fn {fn} outputs: ", self.funcs[fn].outputs)
+        if self.track_time:
+            self._start_timer("global resolution loop")
 
-                    self.funcs[fn].res.input_names = self.funcs[fn].inputs
-                    self.funcs[fn].res.output_names = self.funcs[fn].outputs
-                    made_resolution = True
+        # resolve every function's cgraph to a reservoir, each once, callees first
+        if self.workers == 1:
+            for fn in self._resolution_order():
+                if self.funcs[fn].res is None:
+                    self._resolve_fn(fn)
+        else:
+            self._resolve_parallel()
 
         if self.track_time:
             self._end_timer("global resolution loop")
+            if self.build_cache is not None:
+                hits, misses = self.build_stats["hits"], self.build_stats["misses"]
+                print(f"build cache: {hits} functions reused, {misses} resolved")
+            if self.optimize:
+                self._print_savings()
 
         if "main" not in self.funcs:
             self.throw(None, "Couldn't find 'main' function")
@@ -155,6 +141,163 @@ class ASTCompiler(ast.NodeVisitor):
         assert res is not None, "compile: failed to compile reservoir"
         return res
 
+    def _calls(self, fn: str) -> List[Tuple[str, str]]:
+        """(node name, called function) of every reservoir node in fn's graph."""
+        graph = self.funcs[fn].graph
+        calls = []
+        for node_name in graph.all_nodes():
+            if graph.get_node(node_name)["type"] == "reservoir":
+                calls.append((node_name, self.strip_uid(node_name)))
+        return calls
+
+    def _call_graph(self) -> graphlib.TopologicalSorter:
+        """
+        Sorter over every function and the program functions it calls (stdlib
+        functions, which take precedence, are leaves). Raises on calls to
+        unknown functions.
+        """
+        sorter = graphlib.TopologicalSorter()
+        for fn in self.funcs:
+            callees = []
+            for _, callee in self._calls(fn):
+                if callee in registry:
+                    continue
+                if callee not in self.funcs:
+                    self.throw(None, f"{fn} calls unknown function {callee}")
+                callees.append(callee)
+            sorter.add(fn, *callees)
+        return sorter
+
+    def _throw_cycle(self, e: graphlib.CycleError) -> None:
+        cycle = " -> ".join(reversed(e.args[1]))
+        self.throw(None, f"recursive function calls are unsupported: {cycle}")
+
+    def _resolution_order(self) -> List[str]:
+        """Every function after the program functions it calls."""
+        try:
+            return list(self._call_graph().static_order())
+        except graphlib.CycleError as e:
+            self._throw_cycle(e)
+
+    def _resolve_parallel(self) -> None:
+        """
+        Resolves functions on a process pool as soon as their callees are. Names
+        come from each FnInfo, so the result does not depend on completion order.
+        """
+        sorter = self._call_graph()
+        try:
+            sorter.prepare()
+        except graphlib.CycleError as e:
+            self._throw_cycle(e)
+
+        with ProcessPoolExecutor(max_workers=self.workers) as pool:
+            running = {}
+            while sorter.is_active():
+                for fn in sorter.get_ready():
+                    if self.funcs[fn].res is not None:
+                        sorter.done(fn)  # reused from the build cache
+                        continue
+                    self._attach_callees(fn)
+                    graph = self.funcs[fn].graph
+                    running[pool.submit(_resolve_graph, graph, self.optimize)] = fn
+
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    fn = running.pop(future)
+                    res, self.opt_reports[fn] = future.result()
+                    self._finish_fn(fn, res)
+                    sorter.done(fn)
+
+    def _resolve_fn(self, fn: str) -> None:
+        """Resolves fn's graph, once every function it calls is resolved."""
+        if self.verbose:
+            print(f"ATTEMPTING TO RESOLVE {fn}")
+
+        self._attach_callees(fn)
+
+        if self.track_time:
+            self._start_timer(f"resolve {fn}")
+
+        res, self.opt_reports[fn] = _resolve_graph(self.funcs[fn].graph, self.optimize)
+
+        if self.track_time:
+            self._end_timer(f"resolve {fn}")
+
+        self._finish_fn(fn, res)
+
+    def _attach_callees(self, fn: str) -> None:
+        """Places the reservoir of every function fn calls on its graph node."""
+        graph = self.funcs[fn].graph
+        for node_name, fn_name in self._calls(fn):
+            node = graph.get_node(node_name)
+            if node["reservoir"] is not None:
+                continue
+
+            # check in stdlib
+            if fn_name in registry:
+                if self.verbose:
+                    print(f"res loop: found {fn_name} in registry")
+
+                node["reservoir"] = presets.load(registry[fn_name].path)
+                res = node["reservoir"]
+                res: Reservoir
+
+                # give placeholder names if none
+                if res.name == []:
+                    res.name = fn_name
+                if res.output_names == []:
+                    for i in range(res.W.shape[0]):
+                        res.output_names.append(f"{fn_name}_o{i}")
+                if res.input_names == []:
+                    for i in range(res.x_init.shape[0]):
+                        res.input_names.append(f"{fn_name}_o{i}")
+            # program defined fns precede fn in the resolution order
+            else:
+                if self.verbose:
+                    print(f"res loop: found {fn_name} in compiled fns")
+                # to avoid overwrites
+                node["reservoir"] = self.funcs[fn_name].res.copy()
+
+    def _finish_fn(self, fn: str, res: Reservoir) -> None:
+        """Names fn's resolved reservoir after its arguments and returns."""
+        self.funcs[fn].res = res
+
+        # TODO: make name tracking entirely graph based
+        if self.verbose:
+            print(f"Solved fn {fn} inputs: ", self.funcs[fn].inputs)
+            print(f"Solved fn {fn} outputs: ", self.funcs[fn].outputs)
+
+        self.funcs[fn].res.input_names = self.funcs[fn].inputs
+        self.funcs[fn].res.output_names = self.funcs[fn].outputs
+        if self.build_cache is not None:
+            self.build_cache.put(self.fn_keys[fn], self.funcs[fn].res)
+
+    def _print_savings(self) -> None:
+        """What each optimization pass removed, summed over functions."""
+        merged = sum(r["reservoirs"] for r in self.cse_reports.values())
+        dead = sum(r["graph"]["neurons"] for r in self.opt_reports.values())
+        hidden = sum(r["unobservable"]["neurons"] for r in self.opt_reports.values())
+        print(
+            f"optimize: {merged} repeated calls merged, "
+            f"{dead} neurons in dead reservoirs, {hidden} unobservable"
+        )
+
+    def _load_built(self, fn: str, key: str) -> None:
+        """Takes fn's reservoir from the build cache if it was resolved before."""
+        res = self.build_cache.get(key)
+        if res is None:
+            self.build_stats["misses"] += 1
+            return
+
+        if self.verbose:
+            print(f"build cache: reusing resolved {fn}")
+        res.input_names = self.funcs[fn].inputs
+        res.output_names = self.funcs[fn].outputs
+        self.funcs[fn].res = res
+        self.build_stats["hits"] += 1
+
     def visit_FunctionDef(self, node: ast.FunctionDef) -> None:
         # get name
         fn_name = node.name
@@ -272,6 +415,13 @@ class ASTCompiler(ast.NodeVisitor):
                     self.visit_FunctionDef(self._get_fn_node(func_name))
                     self.curr_fn = temp
 
+                if self.funcs[func_name].out_dim is None:
+                    # still being visited further up the call stack
+                    self.throw(
+                        node,
+                        f"recursive call to {func_name} is unsupported",
+                    )
+
                 if self.verbose:
                     print(f"Fn {func_name} compiled; retrieving from context")
                 out_dim = self.funcs[func_name].out_dim
@@ -296,7 +446,7 @@ class ASTCompiler(ast.NodeVisitor):
             print(f"Calling function {func_name}")
 
         res_name = self.uid_of_name(func_name)
-        self.funcs[self.curr_fn].graph.add_reservoir(res_name, None)
+        self.funcs[self.curr_fn].graph.add_reservoir(res_name, None, fn=func_name)
 
         # process arguments (must be Cvecs of dim 1)
         for i, arg in enumerate(node.args):
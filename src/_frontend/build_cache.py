@@ -0,0 +1,131 @@
+""" Persistent per-function build cache for pyres compilation """
+
+import ast
+import hashlib
+import importlib.util
+import os
+from _prnn.cache import DEFAULT_DIR, SolveCache
+from _std.std import registry
+
+"""
+Every function of a program resolves to a reservoir that only depends on its own
+source, on the functions it calls, and on the stdlib presets those calls load.
+A function's key hashes exactly that (recursively through its callees), so an
+edit re-resolves the edited function and its callers and nothing else. Keys
+also cover the source of the modules that resolve a CGraph, so a change to the
+frontend or Resolver re-resolves everything instead of serving stale builds.
+Resolved reservoirs are stored in a SolveCache directory, with its size bound
+and LRU eviction.
+"""
+
+# bump whenever a change outside RESOLVER_MODULES alters resolved reservoirs
+BUILD_VERSION = 2
+
+# modules whose code decides what a function resolves to
+RESOLVER_MODULES = (
+    "_frontend.ast_compiler",
+    "_cgraph.cgraph",
+    "_cgraph.optimize",
+    "_cgraph.resolve",
+    "_prnn.operators",
+    "_prnn.reduce",
+    "_prnn.reservoir",
+)
+
+PRESETS_DIR = "src/_std/presets"
+
+_file_hashes = {}  # path -> ((mtime_ns, size), sha256)
+
+
+def _file_hash(filepath: str) -> str:
+    """Content hash of a file, rehashed only when the file changes."""
+    try:
+        st = os.stat(filepath)
+    except FileNotFoundError:
+        return "missing"
+
+    stamp = (st.st_mtime_ns, st.st_size)
+    cached = _file_hashes.get(filepath)
+    if cached is None or cached[0] != stamp:
+        with open(filepath, "rb") as f:
+            cached = (stamp, hashlib.sha256(f.read()).hexdigest())
+        _file_hashes[filepath] = cached
+    return cached[1]
+
+
+def preset_version(path: str, directory=PRESETS_DIR) -> str:
+    """Content hash of a stdlib preset ("missing" ones fail on the load anyway)."""
+    return _file_hash(os.path.abspath(os.path.join(directory, f"{path}.rsvr")))
+
+
+def resolver_sources() -> list:
+    """Source files of RESOLVER_MODULES."""
+    return [importlib.util.find_spec(name).origin for name in RESOLVER_MODULES]
+
+
+def resolver_version() -> str:
+    """Hash of the resolver's source, which changes with any edit to it."""
+    h = hashlib.sha256()
+    for path in resolver_sources():
+        h.update(f"{path} {_file_hash(path)}\n".encode())
+    return h.hexdigest()
+
+
+def callees(fn: ast.FunctionDef):
+    """(program functions, stdlib functions) called in fn, as ASTCompiler sees them."""
+    program, std = set(), set()
+    for node in ast.walk(fn):
+        if isinstance(node, ast.Call):
+            if isinstance(node.func, ast.Name):
+                program.add(node.func.id)
+            elif isinstance(node.func, ast.Attribute):
+                std.add(node.func.attr)
+        elif isinstance(node, ast.BoolOp) and isinstance(node.op, ast.And):
+            std.add("std_and")  # see ASTCompiler.visit_BoolOp
+    return program, std
+
+
+def function_keys(
+    module: ast.Module, presets_dir=PRESETS_DIR, optimize=False
+) -> dict:
+    """Build key of every function defined in module (optimized builds get their own)."""
+    fns = {n.name: n for n in module.body if isinstance(n, ast.FunctionDef)}
+    resolver = resolver_version()
+    keys = {}
+
+    def key(name, stack):
+        if name in keys:
+            return keys[name]
+        assert name not in stack, f"build cache: recursive call to {name}"
+
+        fn = fns[name]
+        program, std = callees(fn)
+        h = hashlib.sha256(f"pyres build {BUILD_VERSION} {resolver}\n".encode())
+        if optimize:
+            h.update(b"optimize\n")
+        # ast.dump leaves out line numbers, so moving a function keeps its key
+        h.update(ast.dump(fn).encode())
+        for callee in sorted(program & fns.keys()):
+            h.update(f"\nfn {callee} {key(callee, stack | {name})}".encode())
+        for callee in sorted(std & registry.keys()):
+            version = preset_version(registry[callee].path, presets_dir)
+            h.update(f"\nstd {callee} {version}".encode())
+
+        keys[name] = h.hexdigest()
+        return keys[name]
+
+    for name in fns:
+        key(name, frozenset())
+    return keys
+
+
+_default = None
+
+
+def default_build_cache() -> SolveCache:
+    """Process-wide build cache, under the solve cache's directory."""
+    global _default
+    if _default is None:
+        base = os.environ.get("RESERVOIR_CACHE_DIR", DEFAULT_DIR)
+        _default = SolveCache(os.path.join(base, "builds"))
+    return _default
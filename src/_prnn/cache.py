@@ -0,0 +1,121 @@
+""" Persistent cache of solved reservoirs, keyed by their equations and base RNN """
+
+import hashlib
+import json
+import os
+import pickle as pkl
+
+# default location, overridable with the RESERVOIR_CACHE_DIR environment variable
+DEFAULT_DIR = os.path.join(os.path.expanduser("~"), ".cache", "reservoir-compiler")
+
+# default bound on the total size of the cached reservoirs
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+
+def solve_key(sym_eqs, **params) -> str:
+    """
+    Content hash of a solve: the equations in order (sympy's canonical srepr) and
+    every parameter of the base RNN and solver that shapes the result.
+    """
+    import sympy as sp
+
+    payload = {
+        "eqs": [sp.srepr(eq) for eq in sym_eqs],
+        "params": {k: repr(v) for k, v in sorted(params.items())},
+    }
+    text = json.dumps(payload, sort_keys=True)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+class SolveCache:
+    """
+    Directory of pickled reservoirs named by solve_key, bounded to max_bytes with
+    least-recently-used eviction (file mtimes are bumped on every hit, so the
+    order survives across processes). hits, misses and evictions count this
+    instance's lookups.
+    """
+
+    def __init__(self, directory=None, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory or os.environ.get("RESERVOIR_CACHE_DIR", DEFAULT_DIR)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.rsvr")
+
+    def get(self, key: str):
+        """Returns the cached reservoir for key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                obj = pkl.load(f)
+        except (FileNotFoundError, EOFError, pkl.UnpicklingError):
+            self.misses += 1
+            return None
+
+        os.utime(path)
+        self.hits += 1
+        return obj
+
+    def put(self, key: str, obj):
+        """Stores obj under key (atomically), then evicts down to max_bytes."""
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            pkl.dump(obj, f)
+        os.replace(tmp, path)
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".rsvr"):
+                continue
+            try:
+                st = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue  # evicted by another process
+            entries.append((st.st_mtime, st.st_size, name))
+        return sorted(entries)
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        # always keep the newest entry, even if it alone exceeds the bound
+        for _, size, name in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            total -= size
+            self.evictions += 1
+
+    def clear(self):
+        for _, _, name in self._entries():
+            os.remove(os.path.join(self.directory, name))
+
+    def stats(self) -> dict:
+        entries = self._entries()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+        }
+
+
+_default = None
+
+
+def default_cache() -> SolveCache:
+    """Process-wide SolveCache in the default directory."""
+    global _default
+    if _default is None:
+        _default = SolveCache()
+    return _default
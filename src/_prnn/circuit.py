@@ -2,18 +2,28 @@
 
 import numpy as np
 from _prnn.reservoir import Reservoir
+from _prnn import operators
 
 
 class Circuit:
     """
     Defines the Circuit type, which describes a graph of connected networks.
     * circuit.connect() links a circuit object into a single reservoir
+    * a_format: storage of the connected A, B and W: "dense", "sparse" (CSR),
+    "lowrank" (A as an operators.BlockLowRank, B and W CSR) or "auto", which
+    goes sparse once A is at most operators.SPARSE_FILL full
     """
 
     def __init__(
-        self, config, readouts=None, preserve_reservoirs=False, reservoirs=None
+        self,
+        config,
+        readouts=None,
+        preserve_reservoirs=False,
+        reservoirs=None,
+        a_format="auto",
     ):
         self.config = config
+        self.a_format = a_format
         self.reservoirs = (
             reservoirs if reservoirs is not None else validate2reservoirs(config)
         )
@@ -49,13 +59,15 @@ class Circuit:
 
         # internalize each connection in config into a
         self._process_connections(a, idxs)
+        a = a.assemble(self.a_format)
 
         # remove internalized columns of B and W
         for res in self.reservoirs:
             _cleanup_reservoir(res)
 
-        # combine other elements of constituent reservoirs
-        b, w, x_init, r_init, d = self._combine_reservoirs()
+        # combine other elements of constituent reservoirs, stored like a
+        fmt = "dense" if operators.isdense(a) else "sparse"
+        b, w, x_init, r_init, d = self._combine_reservoirs(fmt)
 
         # Remove zero columns from B and corresponding entries in x_init
         b, x_init = _remove_zero_columns(b, x_init)
@@ -73,26 +85,26 @@ class Circuit:
         """
         Builds the adjacency matrix and tracks reservoir indices.
         Returns:
-        * adj: combined adjacency with each res in self.reservoirs
-        on adjacency
+        * adj: builder of the combined adjacency with each res in
+        self.reservoirs on the diagonal
         * res_idx: index of each constituent reservoir in adj.
         """
         dim = sum(r.A.shape[0] for r in self.reservoirs)
-        adj = np.zeros((dim, dim))
+        adj = operators.CompositeBuilder(dim)
 
         idx = 0
         res_idx = {}
         for r in self.reservoirs:
             sz = r.A.shape[0]
             res_idx[r] = idx
-            adj[idx : idx + sz, idx : idx + sz] = r.A
+            adj.add_reservoir(idx, r.A)
             idx += sz
 
         return adj, res_idx
 
     def _process_connections(self, comb_a, res_indices):
         """
-        Processes connections between reservoirs and updates the combined adjacency matrix comb_a.
+        Processes connections between reservoirs and adds them to the combined adjacency comb_a.
         """
         for out_res, out_idx, in_res, in_idx in self.config:
             out_res: Reservoir
@@ -100,14 +112,11 @@ class Circuit:
 
             try:
                 # Get rows and columns from W and B matrices
-                w_row = out_res.W[out_idx - 1, :].reshape(1, -1)
-                b_col = in_res.B[:, in_idx - 1].reshape(-1, 1)
+                w_row = operators.toarray(out_res.W[[out_idx - 1], :])
+                b_col = operators.toarray(in_res.B[:, [in_idx - 1]])
             except IndexError as e:
                 raise ValueError(f"Index error when processing connection: {e}") from e
 
-            # Compute the outer product to internalize the connection
-            sec = np.outer(b_col, w_row)
-
             # Track used inputs and outputs
             out_res.usedOutputs.add(out_idx)
             in_res.usedInputs.add(in_idx)
@@ -116,69 +125,35 @@ class Circuit:
             try:
                 out_pos = res_indices[out_res]
                 in_pos = res_indices[in_res]
-                sec_rows, sec_cols = sec.shape
+                sec_rows, sec_cols = b_col.shape[0], w_row.shape[1]
 
-                if (
-                    comb_a.shape[0] < in_pos + sec_rows
-                    or comb_a.shape[1] < out_pos + sec_cols
-                ):
+                if comb_a.dim < in_pos + sec_rows or comb_a.dim < out_pos + sec_cols:
                     raise ValueError(
                         "Combined adjacency matrix size mismatch with reservoirs"
                     )
 
-                # Insert section into comb_a at the correct location
-                comb_a[in_pos : in_pos + sec_rows, out_pos : out_pos + sec_cols] += sec
+                # Internalize the connection's outer product into comb_a
+                comb_a.add_coupling(in_pos, b_col, out_pos, w_row)
             except KeyError as e:
                 raise ValueError(
                     f"Reservoir not found in reservoir indices: {e}"
                 ) from e
 
-    def _combine_reservoirs(self):
+    def _combine_reservoirs(self, fmt="dense"):
         """
         Combines the B and W matrices from multiple reservoirs, placing them
-        on their respective diagonals. Also stacks x_init, r_init, and d
-        components for each reservoir.
+        on their respective diagonals in format fmt. Also stacks x_init,
+        r_init, and d components for each reservoir.
         """
 
-        # Initialize empty arrays for stacking and diagonal placement
-        x_all = np.zeros((0, 1))
-        r_all = np.zeros((0, 1))
-        d_all = np.zeros((0, 1))
-        b_comb = np.zeros((0, 0))
-        w_comb = np.zeros((0, 0))
-
-        # Track the current row and column indices for placing the next matrix
-        b_row, b_col, w_row, w_col = 0, 0, 0, 0
-
-        for res in self.reservoirs:
-            b, w = res.B, res.W
-            b_r, b_c = b.shape
-            w_r, w_c = w.shape
-
-            # Resize B and W arrays to fit the new matrices
-            b_comb = (
-                np.pad(b_comb, ((0, b_r), (0, b_c)), mode="constant")
-                if b_comb.size
-                else np.zeros((b_row + b_r, b_col + b_c))
-            )
-            w_comb = (
-                np.pad(w_comb, ((0, w_r), (0, w_c)), mode="constant")
-                if w_comb.size
-                else np.zeros((w_row + w_r, w_col + w_c))
-            )
+        # Place the matrices B and W on their respective diagonals
+        b_comb = operators.block_diag([res.B for res in self.reservoirs], fmt)
+        w_comb = operators.block_diag([res.W for res in self.reservoirs], fmt)
 
-            # Place the matrices B and W on their respective diagonals
-            b_comb[b_row : b_row + b_r, b_col : b_col + b_c] = b
-            w_comb[w_row : w_row + w_r, w_col : w_col + w_c] = w
-
-            # Update row and column indices
-            b_row, b_col = b_row + b_r, b_col + b_c
-            w_row, w_col = w_row + w_r, w_col + w_c
-
-            # Stack x_init, r_init, and d
-            x_all = np.vstack([x_all, res.x_init])
-            r_all = np.vstack([r_all, res.r_init])
-            d_all = np.vstack([d_all, res.d])
+        # Stack x_init, r_init, and d in one pass each
+        x_all = np.concatenate([res.x_init for res in self.reservoirs])
+        r_all = np.concatenate([res.r_init for res in self.reservoirs])
+        d_all = np.concatenate([res.d for res in self.reservoirs])
 
         return b_comb, w_comb, x_all, r_all, d_all
 
@@ -209,45 +184,28 @@ def _remove_zero_columns(b, x_init):
         B (np.ndarray): Updated B matrix.
         x_init (np.ndarray): Updated x_init vector.
     """
-    i = 0
-    while i < b.shape[1]:
-        # Check if all elements in column i are zeros
-        if np.all(b[:, i] == 0):
-            if b.shape[1] > 1:  # Remove column if not the last one
-                b = np.delete(b, i, axis=1)
-                x_init = np.delete(x_init, i, axis=0)
-            else:  # If it's the last column, set to zeros
-                b = np.zeros_like(b)
-                x_init = np.zeros((1, 1))
-                break
-        else:
-            i += 1
-    return b, x_init
+    col_nnz = operators.toarray(abs(b).sum(axis=0)).reshape(-1)
+    zero = np.flatnonzero(col_nnz == 0)
+    if len(zero) == b.shape[1]:  # keep a single zero column
+        return operators.zeros((b.shape[0], 1), like=b), np.zeros((1, 1))
+    return operators.delete(b, zero, axis=1), np.delete(x_init, zero, axis=0)
 
 
 def _cleanup_reservoir(reservoir: Reservoir):
     """Remove used inputs from B and x_init, and used outputs from W for a reservoir."""
 
-    # Remove used inputs from B and x_init
-    for inp in reservoir.usedInputs:
-        reservoir.B = (
-            np.delete(reservoir.B, inp - 1, axis=1)
-            if reservoir.B.shape[1] > 1
-            else np.zeros_like(reservoir.B)
-        )
-        reservoir.x_init = (
-            np.delete(reservoir.x_init, inp - 1, axis=0)
-            if reservoir.x_init.shape[0] > 1
-            else np.zeros((1, 1))
-        )
+    # Remove used inputs from B and x_init, all in one selection (indices are 1-based)
+    inputs = [inp - 1 for inp in reservoir.usedInputs]
+    if len(inputs) < reservoir.B.shape[1]:
+        reservoir.B = operators.delete(reservoir.B, inputs, axis=1)
+        reservoir.x_init = np.delete(reservoir.x_init, inputs, axis=0)
+    else:
+        reservoir.B = operators.zeros((reservoir.B.shape[0], 1), like=reservoir.B)
+        reservoir.x_init = np.zeros((1, 1))
 
     # Remove used outputs from W
-    for out in reservoir.usedOutputs:
-        reservoir.W = (
-            np.delete(reservoir.W, out - 1, axis=0)
-            if reservoir.W.shape[0] > 1
-            else np.zeros((0, reservoir.A.shape[0]))
-        )
+    outputs = [out - 1 for out in reservoir.usedOutputs]
+    reservoir.W = operators.delete(reservoir.W, outputs, axis=0)
 
 
 def validate2reservoirs(config) -> list[Reservoir]:
@@ -0,0 +1,168 @@
+""" Integrators for the reservoir ODE beyond the fixed-step RK4 in Reservoir """
+
+import numpy as np
+
+"""
+Dormand-Prince 5(4): Butcher tableau, embedded error weights and the
+coefficients of the 4th order continuous extension (Hairer, Norsett & Wanner).
+"""
+
+DP_A = np.array(
+    [
+        [0, 0, 0, 0, 0, 0],
+        [1 / 5, 0, 0, 0, 0, 0],
+        [3 / 40, 9 / 40, 0, 0, 0, 0],
+        [44 / 45, -56 / 15, 32 / 9, 0, 0, 0],
+        [19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729, 0, 0],
+        [9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656, 0],
+        [35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84],
+    ]
+)
+
+DP_E = np.array(
+    [-71 / 57600, 0, 71 / 16695, -71 / 1920, 17253 / 339200, -22 / 525, 1 / 40]
+)
+
+DP_P = np.array(
+    [
+        [
+            1,
+            -8048581381 / 2820520608,
+            8663915743 / 2820520608,
+            -12715105075 / 11282082432,
+        ],
+        [0, 0, 0, 0],
+        [
+            0,
+            131558114200 / 32700410799,
+            -68118460800 / 10900136933,
+            87487479700 / 32700410799,
+        ],
+        [
+            0,
+            -1754552775 / 470086768,
+            14199869525 / 1410260304,
+            -10690763975 / 1880347072,
+        ],
+        [
+            0,
+            127303824393 / 49829197408,
+            -318862633887 / 49829197408,
+            701980252875 / 199316789632,
+        ],
+        [0, -282668133 / 205662961, 2019193451 / 616988883, -1453857185 / 822651844],
+        [0, 40617522 / 29380423, -110615467 / 29380423, 69997945 / 29380423],
+    ]
+)
+
+
+def new_stats(method: str) -> dict:
+    """Step statistics collected by the integrators in this module."""
+    return {
+        "method": method,
+        "steps": 0,
+        "rejected": 0,
+        "fev": 0,
+        "h_min": np.inf,
+        "h_max": 0.0,
+    }
+
+
+def dopri5(f, r, t_out, t_end, h, rtol, atol, stats):
+    """
+    Integrates the autonomous system dr/dt = f(r) from t = 0 to t_end with
+    Dormand-Prince 5(4) and local error control, sampling the dense output at the
+    sorted times t_out (0 <= t_out < t_end).
+
+    Args:
+        f: maps a state vector to its time derivative.
+        r (np.ndarray): state at t = 0, length n.
+        h (float): initial step size guess.
+        rtol, atol (float): relative and absolute local error tolerances.
+        stats (dict): counters from new_stats, updated in place.
+
+    Returns:
+        (n x len(t_out) states, state at t_end, suggested next step size)
+    """
+    out = np.empty((r.shape[0], len(t_out)))
+    powers = np.arange(1, 5).reshape(-1, 1)
+
+    j = 0
+    while j < len(t_out) and t_out[j] <= 0:
+        out[:, j] = r
+        j += 1
+
+    K = np.empty((7, r.shape[0]))
+    K[0] = f(r)
+    stats["fev"] += 1
+
+    t = 0.0
+    while t < t_end:
+        h = min(h, t_end - t)
+
+        for s in range(1, 7):
+            K[s] = f(r + h * (DP_A[s, :s] @ K[:s]))
+        stats["fev"] += 6
+        r_new = r + h * (DP_A[6, :6] @ K[:6])
+
+        scale = atol + rtol * np.maximum(np.abs(r), np.abs(r_new))
+        err = np.sqrt(np.mean((h * (DP_E @ K) / scale) ** 2))
+
+        if err <= 1:
+            t_new = t + h if t_end - t > h else t_end
+
+            # dense output for every requested time in (t, t_new]
+            stop = np.searchsorted(t_out, t_new, side="right")
+            if stop > j:
+                theta = (t_out[j:stop] - t) / h
+                out[:, j:stop] = r.reshape(-1, 1) + h * (K.T @ DP_P) @ (theta**powers)
+                j = stop
+
+            stats["steps"] += 1
+            stats["h_min"] = min(stats["h_min"], h)
+            stats["h_max"] = max(stats["h_max"], h)
+
+            r, t = r_new, t_new
+            K[0] = K[6]
+            h *= min(10.0, 0.9 * err**-0.2) if err > 0 else 10.0
+        else:
+            stats["rejected"] += 1
+            h *= max(0.2, 0.9 * err**-0.2)
+
+    return out, r, h
+
+
+def etdrk4_coefficients(L, h, M=32):
+    """
+    Coefficients of the Cox-Matthews ETDRK4 scheme for dr/dt = L * r + N(r) with
+    a scalar linear part L and step h. The phi-functions are evaluated as contour
+    means (Kassam & Trefethen) to avoid cancellation when |L * h| is small.
+
+    Returns:
+        (E, E2, Q, f1, f2, f3)
+    """
+    z = L * h
+    zr = z + np.exp(1j * np.pi * (np.arange(1, M + 1) - 0.5) / M)
+
+    E = np.exp(z)
+    E2 = np.exp(z / 2)
+    Q = h * np.mean((np.exp(zr / 2) - 1) / zr).real
+    f1 = h * np.mean((-4 - zr + np.exp(zr) * (4 - 3 * zr + zr**2)) / zr**3).real
+    f2 = h * np.mean((2 + zr + np.exp(zr) * (zr - 2)) / zr**3).real
+    f3 = h * np.mean((-4 - 3 * zr - zr**2 + np.exp(zr) * (4 - zr)) / zr**3).real
+    return E, E2, Q, f1, f2, f3
+
+
+def etdrk4_step(N, r, coef):
+    """One ETDRK4 step of dr/dt = L * r + N(r), given etdrk4_coefficients(L, h)."""
+    E, E2, Q, f1, f2, f3 = coef
+
+    Nr = N(r)
+    a = E2 * r + Q * Nr
+    Na = N(a)
+    b = E2 * r + Q * Na
+    Nb = N(b)
+    c = E2 * a + Q * (2 * Nb - Nr)
+    Nc = N(c)
+
+    return E * r + f1 * Nr + 2 * f2 * (Na + Nb) + f3 * Nc
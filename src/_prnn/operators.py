@@ -0,0 +1,250 @@
+""" Storage formats for the composite matrices of connected reservoirs """
+
+import sys
+import numpy as np
+
+"""
+A composite built from many reservoirs is block diagonal plus a rank-1 block per
+connection, so most of A, B and W is zero once a circuit has more than a few
+gates. Composites are assembled from their blocks without a dense intermediate
+and stored as scipy.sparse CSR when the fill ratio is low enough, or kept in that
+structure as a BlockLowRank operator.
+"""
+
+FORMATS = ("auto", "dense", "sparse", "lowrank")
+
+# largest fill ratio (nonzeros / entries) at which "auto" stores a composite sparse
+SPARSE_FILL = 0.1
+
+
+def _sparse():
+    """scipy.sparse, imported on first use so dense-only runs never load scipy."""
+    sparse = sys.modules.get("scipy.sparse")
+    if sparse is None:
+        import scipy.sparse as sparse
+    return sparse
+
+
+def issparse(m) -> bool:
+    # a sparse matrix can only exist once scipy.sparse has been imported
+    sparse = sys.modules.get("scipy.sparse")
+    return sparse is not None and sparse.issparse(m)
+
+
+def isdense(m) -> bool:
+    return isinstance(m, np.ndarray)
+
+
+def nnz(m) -> int:
+    """Number of nonzero entries of a dense, sparse or BlockLowRank matrix."""
+    return np.count_nonzero(m) if isdense(m) else m.count_nonzero()
+
+
+def toarray(m) -> np.ndarray:
+    return np.asarray(m) if isdense(m) else m.toarray()
+
+
+def choose_format(fmt: str, nonzeros: int, shape) -> str:
+    """Resolves fmt (one of FORMATS) for a matrix of shape."""
+    if fmt not in FORMATS:
+        raise ValueError(f"unknown matrix format {fmt!r}, expected one of {FORMATS}")
+    if fmt != "auto":
+        return fmt
+    size = shape[0] * shape[1]
+    return "sparse" if size and nonzeros <= SPARSE_FILL * size else "dense"
+
+
+def assemble(blocks, shape, fmt="auto"):
+    """
+    Sums placed blocks into a matrix of the given shape.
+
+    Args:
+        blocks: iterable of (row, col, block), block dense or sparse.
+        fmt: "dense", "sparse" (CSR) or "auto", which picks by fill ratio.
+    """
+    blocks = list(blocks)
+    fmt = choose_format(fmt, sum(nnz(b) for _, _, b in blocks), shape)
+
+    if fmt == "dense":
+        out = np.zeros(shape)
+        for i, j, b in blocks:
+            out[i : i + b.shape[0], j : j + b.shape[1]] += toarray(b)
+        return out
+
+    rows, cols, vals = [np.zeros(0, dtype=int)], [np.zeros(0, dtype=int)], [[]]
+    for i, j, b in blocks:
+        if issparse(b):
+            b = b.tocoo()
+            r, c, v = b.row, b.col, b.data
+        else:
+            # nonzeros of a dense block directly, without a COO object per block
+            b = toarray(b)
+            r, c = np.nonzero(b)
+            v = b[r, c]
+        rows.append(r + i)
+        cols.append(c + j)
+        vals.append(v)
+    coo = _sparse().coo_array(
+        (np.concatenate(vals), (np.concatenate(rows), np.concatenate(cols))),
+        shape=shape,
+    )
+    return coo.tocsr()
+
+
+def block_diag(mats, fmt="auto"):
+    """Places mats along the diagonal (zero-row or zero-column blocks still shift it)."""
+    blocks, row, col = [], 0, 0
+    for m in mats:
+        blocks.append((row, col, m))
+        row, col = row + m.shape[0], col + m.shape[1]
+    return assemble(blocks, (row, col), fmt)
+
+
+def delete(m, idx, axis):
+    """
+    np.delete for a dense or sparse matrix. idx may be a list, so that any number
+    of rows or columns is removed in a single selection.
+    """
+    if not issparse(m):
+        return np.delete(m, idx, axis=axis)
+    keep = np.ones(m.shape[axis], dtype=bool)
+    keep[idx] = False
+    return _sparse().csr_array(m[:, keep] if axis == 1 else m[keep, :])
+
+
+def submatrix(m, rows, cols):
+    """m[rows][:, cols] for any matrix; sparse and BlockLowRank come out CSR."""
+    if isdense(m):
+        return m[np.ix_(rows, cols)]
+    m = m if issparse(m) else m.tocsr()
+    return m[rows][:, cols].tocsr()
+
+
+def zeros(shape, like):
+    """Zero matrix of shape, stored like the matrix it replaces."""
+    return _sparse().csr_array(shape) if issparse(like) else np.zeros(shape)
+
+
+def matmul(m, x):
+    """np.matmul(m, x) for any matrix m, broadcasting over x's leading axes."""
+    if isdense(m) or x.ndim <= 2:
+        return m @ x
+    xt = np.moveaxis(x, -2, 0)
+    out = m @ xt.reshape(xt.shape[0], -1)
+    return np.moveaxis(out.reshape((m.shape[0],) + xt.shape[1:]), 0, -2)
+
+
+class BlockLowRank:
+    """
+    n x n operator blockdiag(A_1, ..., A_r) + U @ Vt, the structure of a composite
+    adjacency: one dense block per constituent reservoir plus a rank-1 term per
+    internalized connection. U (n x c) and Vt (c x n) are CSR, each column of U
+    and row of Vt covering a single reservoir.
+
+    A matvec costs sum(n_i^2) for the blocks, batched over blocks of equal size,
+    plus O(nnz(U) + nnz(Vt)) for the coupling.
+    """
+
+    def __init__(self, blocks, U, Vt):
+        self.blocks = [np.asarray(b, dtype=float) for b in blocks]
+        sizes = [b.shape[0] for b in self.blocks]
+        self.offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]]).astype(int)
+        n = int(sum(sizes))
+        self.shape = (n, n)
+        self.ndim = 2
+        self.U = _sparse().csr_array(U)
+        self.Vt = _sparse().csr_array(Vt)
+        assert self.U.shape == (n, self.Vt.shape[0]) and self.Vt.shape[1] == n
+
+        # blocks of equal size are stacked so one batched matmul covers them
+        self._groups = []
+        for size in sorted(set(sizes)):
+            members = [i for i, sz in enumerate(sizes) if sz == size]
+            idx = np.concatenate([self.offsets[i] + np.arange(size) for i in members])
+            if np.array_equal(idx, np.arange(idx[0], idx[0] + len(idx))):
+                idx = slice(int(idx[0]), int(idx[0]) + len(idx))
+            self._groups.append((idx, np.stack([self.blocks[i] for i in members])))
+
+    @property
+    def rank(self) -> int:
+        """Number of rank-1 coupling terms."""
+        return self.U.shape[1]
+
+    def __matmul__(self, x):
+        x = np.asarray(x)
+        out = np.empty(x.shape)
+        for idx, stack in self._groups:
+            g, size = stack.shape[:2]
+            xg = x[idx].reshape((g, size, -1))
+            out[idx] = (stack @ xg).reshape((g * size,) + x.shape[1:])
+        if self.rank:
+            out += self.U @ (self.Vt @ x)
+        return out
+
+    def count_nonzero(self) -> int:
+        return self.tocsr().count_nonzero()
+
+    def tocsr(self):
+        placed = [(o, o, b) for o, b in zip(self.offsets, self.blocks)]
+        return assemble(placed, self.shape, "sparse") + self.U @ self.Vt
+
+    def toarray(self) -> np.ndarray:
+        out = np.zeros(self.shape)
+        for o, b in zip(self.offsets, self.blocks):
+            out[o : o + b.shape[0], o : o + b.shape[1]] = b
+        return out + (self.U @ self.Vt).toarray()
+
+
+class CompositeBuilder:
+    """
+    Collects the pieces of a composite adjacency: the constituent reservoirs' A
+    on the diagonal and the factors of each internalized connection, so the
+    composite can be assembled dense, sparse or as a BlockLowRank operator.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.diagonal = []  # (pos, A_i)
+        self.couplings = (
+            []
+        )  # (in_pos, u, out_pos, v): u @ v.T placed at in_pos, out_pos
+
+    def add_reservoir(self, pos: int, a):
+        """Places a reservoir's adjacency on the diagonal at pos."""
+        if isinstance(a, BlockLowRank):
+            # keep nested composites structured rather than densifying them
+            for o, b in zip(a.offsets, a.blocks):
+                self.diagonal.append((pos + o, b))
+            if a.rank:
+                self.couplings.append((pos, a.U, pos, a.Vt.T))
+        else:
+            self.diagonal.append((pos, a))
+
+    def add_coupling(self, in_pos: int, b_col, out_pos: int, w_row):
+        """Adds the connection outer(b_col, w_row) at rows in_pos, columns out_pos."""
+        u = np.asarray(b_col).reshape(-1, 1)
+        v = np.asarray(w_row).reshape(-1, 1)
+        self.couplings.append((in_pos, u, out_pos, v))
+
+    def assemble(self, fmt="auto"):
+        """Builds the composite in fmt (one of FORMATS)."""
+        shape = (self.dim, self.dim)
+        if fmt != "lowrank":
+            blocks = [(p, p, a) for p, a in self.diagonal]
+            for i, u, j, v in self.couplings:
+                blocks.append((i, j, u @ v.T))
+            return assemble(blocks, shape, fmt)
+
+        blocks = []
+        for p, a in self.diagonal:
+            assert p == sum(b.shape[0] for b in blocks), "diagonal must be contiguous"
+            blocks.append(toarray(a))
+
+        u_blocks, v_blocks, c = [], [], 0
+        for i, u, j, v in self.couplings:
+            u_blocks.append((i, c, u))
+            v_blocks.append((c, j, v.T))
+            c += u.shape[1]
+        U = assemble(u_blocks, (self.dim, c), "sparse")
+        Vt = assemble(v_blocks, (c, self.dim), "sparse")
+        return BlockLowRank(blocks, U, Vt)
@@ -0,0 +1,127 @@
+""" In-process cache of loaded presets, shared by every compiler in the process """
+
+import os
+from collections import OrderedDict
+import numpy as np
+from _prnn import operators
+from _prnn.reservoir import Reservoir
+
+"""
+Compiling a circuit loads the same preset once per use (500 nand calls used to
+unpickle nand.rsvr 500 times). The cache keeps one master Reservoir per preset
+file and hands out flyweights: new Reservoir objects that share the master's
+matrices, frozen read-only, and own everything small and mutable (r, names,
+used inputs/outputs). Code that changes a flyweight's matrices must assign new
+arrays (res.d = res.d + e), which leaves the shared ones intact; writing into
+them in place raises.
+
+Entries are dropped when their file's mtime or size changes, and least recently
+used presets are evicted beyond max_entries.
+"""
+
+# number of distinct preset files kept by the default cache
+DEFAULT_MAX_ENTRIES = 128
+
+
+def _freeze(m):
+    """Marks the storage of a dense, sparse or BlockLowRank matrix read-only."""
+    if isinstance(m, np.ndarray):
+        m.setflags(write=False)
+    elif operators.issparse(m):
+        for part in ("data", "indices", "indptr"):
+            getattr(m, part).setflags(write=False)
+    elif isinstance(m, operators.BlockLowRank):
+        for b in m.blocks:
+            b.setflags(write=False)
+        for _, stack in m._groups:
+            stack.setflags(write=False)
+        _freeze(m.U)
+        _freeze(m.Vt)
+
+
+def flyweight(master: Reservoir) -> Reservoir:
+    """New Reservoir sharing master's matrices, with its own copies of the rest."""
+    res = object.__new__(Reservoir)
+    res.__dict__.update(master.__dict__)
+    res.r = np.array(master.r, copy=True)
+    res.input_names = list(master.input_names)
+    res.output_names = list(master.output_names)
+    res.usedInputs = set(master.usedInputs)
+    res.usedOutputs = set(master.usedOutputs)
+    if master.__dict__.get("solve_info") is not None:
+        res.solve_info = dict(master.solve_info)
+    return res
+
+
+class PresetCache:
+    """
+    Least-recently-used map from preset file to its master Reservoir. loads counts
+    reads from disk, hits lookups served from memory, invalidations entries
+    reloaded because their file changed, and evictions entries dropped for space.
+    """
+
+    def __init__(self, max_entries=DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # path -> ((mtime_ns, size), master)
+        self.loads = 0
+        self.hits = 0
+        self.invalidations = 0
+        self.evictions = 0
+
+    def load(self, filename, directory="src/_std/presets") -> Reservoir:
+        """Reservoir.load, served from memory while the file is unchanged."""
+        path = os.path.abspath(os.path.join(directory, f"{filename}.rsvr"))
+        try:
+            st = os.stat(path)
+            stamp = (st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = None  # let Reservoir.load raise its usual error
+
+        entry = self._entries.get(path)
+        if entry is not None and entry[0] == stamp:
+            self._entries.move_to_end(path)
+            self.hits += 1
+            return flyweight(entry[1])
+        if entry is not None:
+            self.invalidations += 1
+
+        # one master per file, so at most max_entries maps are open
+        master = Reservoir.load(filename, directory, mmap=True)
+        self.loads += 1
+        for name in ("A", "B", "W", "d", "r_init", "x_init"):
+            _freeze(getattr(master, name, None))
+
+        self._entries[path] = (stamp, master)
+        self._entries.move_to_end(path)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+        return flyweight(master)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            "loads": self.loads,
+            "hits": self.hits,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+        }
+
+
+_default = None
+
+
+def default_cache() -> PresetCache:
+    """Process-wide PresetCache, shared by ASTCompiler and ir.core."""
+    global _default
+    if _default is None:
+        _default = PresetCache()
+    return _default
+
+
+def load(filename, directory="src/_std/presets") -> Reservoir:
+    """Loads a preset through the process-wide cache."""
+    return default_cache().load(filename, directory)
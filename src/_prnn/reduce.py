@@ -0,0 +1,188 @@
+""" Model-order reduction of solved and composite reservoirs by neuron pruning """
+
+import numpy as np
+from _prnn import operators
+from _prnn.reservoir import Reservoir
+
+"""
+A reduced reservoir must still be a reservoir (tanh of each neuron's drive), so
+rather than projecting onto a subspace, whole neurons are removed:
+
+    * each neuron is scored by how much replacing it with its mean over sampled
+      trajectories perturbs the rest: std(r_i) * (|A[:, i]| + |W[:, i]|)
+    * the lowest-scoring neurons are dropped and their mean drive A[:, i] mean(r_i)
+      is folded into d, so neurons stuck near a fixed value cost nothing
+    * W is refit by least squares from the surviving states to the original
+      outputs (W does not feed back, so this leaves the dynamics unchanged)
+
+The number of pruned neurons is bisected against the output error on the
+sampled inputs, assuming that pruning more neurons never reduces it.
+"""
+
+
+def _input_sets(res: Reservoir, inputs, time):
+    if inputs is None:
+        res._check_void_input(time, "prune")
+        return [None]
+    return inputs if isinstance(inputs, (list, tuple)) else [inputs]
+
+
+def _trajectories(res: Reservoir, sets, time):
+    """States of res from its current r over every input set, leaving res.r as is."""
+    r0 = np.array(res.r, dtype=float, copy=True)
+    states = []
+    for x in sets:
+        res.r = r0.copy()
+        with np.errstate(over="ignore", invalid="ignore"):
+            states.append(res.run(x, time=time, W=res.W, ret_states=True))
+    res.r = r0
+    return states
+
+
+def sensitivity(A, W, states: np.ndarray) -> np.ndarray:
+    """Per-neuron score std(r_i) * (|A[:, i]| + |W[:, i]|) over sampled states (n x T)."""
+    spread = states.std(axis=1)
+    A, W = operators.toarray(A), operators.toarray(W)
+    return spread * (np.linalg.norm(A, axis=0) + np.linalg.norm(W, axis=0))
+
+
+def drop_neurons(res: Reservoir, drop, mean: np.ndarray) -> Reservoir:
+    """
+    Copy of res without the neurons in drop, each replaced by its value in mean
+    (length n) through d. Sparse and BlockLowRank adjacencies come out CSR.
+    """
+    n = res.A.shape[0]
+    keep = np.setdiff1d(np.arange(n), drop)
+    frozen = np.zeros(n)
+    frozen[drop] = mean[drop]
+    d = res.d.reshape(-1) + operators.toarray(res.A @ frozen).reshape(-1)
+
+    B = operators.submatrix(res.B, keep, np.arange(res.B.shape[1]))
+    W = operators.submatrix(res.W, np.arange(res.W.shape[0]), keep)
+    reduced = Reservoir(
+        operators.submatrix(res.A, keep, keep),
+        B,
+        np.asarray(res.r_init).reshape(-1, 1)[keep],
+        res.x_init,
+        res.global_timescale,
+        res.gamma,
+        d[keep].reshape(-1, 1),
+        W,
+        name=res.name,
+        input_names=list(res.input_names),
+        output_names=list(res.output_names),
+        r=np.asarray(res.r).reshape(-1, 1)[keep].copy(),
+    )
+    reduced.usedInputs = set(res.usedInputs)
+    reduced.usedOutputs = set(res.usedOutputs)
+    return reduced
+
+
+def prune(
+    res: Reservoir,
+    inputs=None,
+    time=None,
+    tol=1e-2,
+    refit=True,
+    verbose=False,
+):
+    """
+    Prunes as many neurons of res as keeps its outputs within tol of the original's.
+
+    Args:
+        res: solved or composite reservoir; runs start from its current res.r.
+        inputs: k x T input array, or a list of them, to sample trajectories on
+            (None for void-input reservoirs, with time steps).
+        tol: bound on max |y_reduced - y| / max |y| over every input set.
+        refit: refit W on the reduced states (otherwise W is only sliced).
+
+    Returns:
+        (reduced reservoir, report) where report holds the neuron counts, the
+        removed (original) neuron indices and the max, rms and relative output
+        errors against res on the inputs.
+    """
+    sets = _input_sets(res, inputs, time)
+    states = _trajectories(res, sets, time)
+    W = operators.toarray(res.W)
+    targets = [W @ s for s in states]
+    scale = max(np.abs(y).max() for y in targets) or 1.0
+
+    flat = np.hstack(states)
+    mean = flat.mean(axis=1)
+    order = np.argsort(sensitivity(res.A, W, flat), kind="stable")
+
+    def attempt(count):
+        reduced = drop_neurons(res, np.sort(order[:count]), mean)
+        reduced_states = _trajectories(reduced, sets, time)
+        if refit:
+            fit = np.linalg.lstsq(
+                np.hstack(reduced_states).T, np.hstack(targets).T, rcond=None
+            )[0].T
+            reduced.W = fit if operators.isdense(res.W) else operators.assemble(
+                [(0, 0, fit)], fit.shape, "sparse"
+            )
+        w = operators.toarray(reduced.W)
+        errors = [w @ s - y for s, y in zip(reduced_states, targets)]
+        err = np.hstack(errors)
+        err = np.where(np.isfinite(err), err, np.inf)
+        return reduced, err
+
+    def error_of(err):
+        return np.abs(err).max() / scale if err.size else 0.0
+
+    best, best_err = attempt(0)
+    lo, hi = 0, res.A.shape[0]  # lo prunes within tol, hi is not known to
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        reduced, err = attempt(mid)
+        ok = error_of(err) <= tol
+        if verbose:
+            print(f"prune: {mid} neurons removed, relative error {error_of(err):.3g}")
+        if ok:
+            lo, best, best_err = mid, reduced, err
+        else:
+            hi = mid
+
+    report = {
+        "neurons": res.A.shape[0],
+        "kept": best.A.shape[0],
+        "removed": np.sort(order[:lo]),
+        "max_error": float(np.abs(best_err).max()) if best_err.size else 0.0,
+        "rms_error": float(np.sqrt(np.mean(best_err**2))) if best_err.size else 0.0,
+        "relative_error": error_of(best_err),
+        "tol": tol,
+    }
+    return best, report
+
+
+def unobservable(res: Reservoir) -> np.ndarray:
+    """
+    Neurons with no path through A to a neuron the readout sees (a nonzero
+    column of W). They cannot affect any output, so they can be dropped exactly.
+    """
+    import scipy.sparse as sparse
+    from scipy.sparse.csgraph import breadth_first_order
+
+    n = res.A.shape[0]
+    A = res.A if operators.isdense(res.A) else operators.submatrix(
+        res.A, np.arange(n), np.arange(n)
+    )
+    A = sparse.coo_array(A)
+    read = np.flatnonzero(operators.toarray(abs(res.W).sum(axis=0)).reshape(-1))
+
+    # edge i -> j where neuron j drives neuron i, plus a source node n -> readout
+    rows = np.concatenate([A.row, np.full(len(read), n)])
+    cols = np.concatenate([A.col, read])
+    graph = sparse.csr_array((np.ones(len(rows)), (rows, cols)), shape=(n + 1, n + 1))
+
+    seen = np.zeros(n + 1, dtype=bool)
+    seen[breadth_first_order(graph, n, directed=True, return_predecessors=False)] = True
+    return np.flatnonzero(~seen[:n])
+
+
+def remove_unobservable(res: Reservoir):
+    """(res without its unobservable neurons, number removed); res itself if none."""
+    drop = unobservable(res)
+    if len(drop) == 0:
+        return res, 0
+    return drop_neurons(res, drop, np.zeros(res.A.shape[0])), len(drop)
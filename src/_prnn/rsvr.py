@@ -0,0 +1,221 @@
+""" Versioned, memory-mappable .rsvr file format """
+
+import argparse
+import glob
+import json
+import mmap as _mmap
+import os
+import pickle as pkl
+import struct
+import numpy as np
+from _prnn import operators
+
+"""
+.rsvr v2 layout:
+    * 8 bytes magic, then little-endian uint32 version and uint32 header size
+    * JSON header: name, input/output names, used inputs/outputs, timescale,
+      gamma, solve_info and a table of arrays (dtype, shape, byte offset)
+    * the raw C-order arrays, each starting on an ALIGN byte boundary
+
+so every array can be opened with np.memmap instead of being read. Sparse
+matrices are stored as their CSR data/indices/indptr, BlockLowRank operators
+as their blocks plus the CSR U and Vt factors. Files without the magic are v1
+pickles, which read still accepts.
+"""
+
+MAGIC = b"\x93RSVR\r\n\x1a"
+VERSION = 2
+ALIGN = 64
+
+_PREFIX = struct.Struct("<8sII")
+_ARRAYS = ("A", "B", "W", "d", "r_init", "x_init", "r")
+
+
+def _flatten(name, m, out):
+    """Splits a matrix into named raw arrays; returns its header entry."""
+    if operators.isdense(m):
+        out[name] = np.ascontiguousarray(m)
+        return {"format": "dense"}
+    if operators.issparse(m):
+        import scipy.sparse as sparse
+
+        m = sparse.csr_array(m)
+        for part in ("data", "indices", "indptr"):
+            out[f"{name}.{part}"] = np.ascontiguousarray(getattr(m, part))
+        return {"format": "csr", "shape": list(m.shape)}
+    if isinstance(m, operators.BlockLowRank):
+        for i, b in enumerate(m.blocks):
+            out[f"{name}.block{i}"] = np.ascontiguousarray(b)
+        return {
+            "format": "lowrank",
+            "blocks": len(m.blocks),
+            "U": _flatten(f"{name}.U", m.U, out),
+            "Vt": _flatten(f"{name}.Vt", m.Vt, out),
+        }
+    raise TypeError(f"rsvr: cannot store {name} of type {type(m).__name__}")
+
+
+def _unflatten(name, entry, arrays):
+    fmt = entry["format"]
+    if fmt == "dense":
+        return arrays[name]
+    if fmt == "csr":
+        import scipy.sparse as sparse
+
+        parts = tuple(arrays[f"{name}.{p}"] for p in ("data", "indices", "indptr"))
+        return sparse.csr_array(parts, shape=tuple(entry["shape"]), copy=False)
+    if fmt == "lowrank":
+        blocks = [arrays[f"{name}.block{i}"] for i in range(entry["blocks"])]
+        U = _unflatten(f"{name}.U", entry["U"], arrays)
+        Vt = _unflatten(f"{name}.Vt", entry["Vt"], arrays)
+        return operators.BlockLowRank(blocks, U, Vt)
+    raise ValueError(f"rsvr: unknown matrix format {fmt!r}")
+
+
+def _jsonable(obj):
+    if isinstance(obj, (np.generic, np.ndarray)):
+        return obj.tolist()
+    raise TypeError(f"rsvr: cannot store {type(obj).__name__} in the header")
+
+
+def _aligned(n: int) -> int:
+    return -(-n // ALIGN) * ALIGN
+
+
+def write(res, path):
+    """Writes res to path in the v2 format (atomically)."""
+    arrays, matrices = {}, {}
+    for name in _ARRAYS:
+        m = getattr(res, name, None)
+        if m is not None:
+            matrices[name] = _flatten(name, m, arrays)
+
+    header = {
+        "name": res.name,
+        "input_names": list(res.input_names),
+        "output_names": list(res.output_names),
+        "used_inputs": sorted(res.usedInputs),
+        "used_outputs": sorted(res.usedOutputs),
+        "global_timescale": float(res.global_timescale),
+        "gamma": float(res.gamma),
+        "solve_info": getattr(res, "solve_info", None),
+        "matrices": matrices,
+        "arrays": {},
+    }
+
+    # offsets depend on the header size, which depends on the offsets' digits;
+    # a fixed point is reached within a couple of passes
+    start = 0
+    while True:
+        offset = start
+        for name, a in arrays.items():
+            header["arrays"][name] = {
+                "dtype": a.dtype.str,
+                "shape": list(a.shape),
+                "offset": offset,
+            }
+            offset = _aligned(offset + a.nbytes)
+        blob = json.dumps(header, default=_jsonable).encode()
+        data_start = _aligned(_PREFIX.size + len(blob))
+        if data_start == start:
+            break
+        start = data_start
+
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_PREFIX.pack(MAGIC, VERSION, len(blob)))
+        f.write(blob)
+        for name, a in arrays.items():
+            f.seek(header["arrays"][name]["offset"])
+            f.write(a.tobytes())
+        f.truncate(max(offset, start))
+    os.replace(tmp, path)
+
+
+def version(path) -> int:
+    """Format version of an .rsvr file (1 for pickles)."""
+    with open(path, "rb") as f:
+        prefix = f.read(_PREFIX.size)
+    if len(prefix) == _PREFIX.size and prefix[:8] == MAGIC:
+        return _PREFIX.unpack(prefix)[1]
+    return 1
+
+
+def read(path, cls, mmap=False):
+    """
+    Reads a reservoir of class cls from path, in either format.
+
+    With mmap, v2 arrays are views of one copy-on-write memory map of the file:
+    opening is O(header) and pages are shared between processes until written.
+    Each map holds a file descriptor until its arrays are freed, so mapping
+    suits a few large reservoirs rather than many small ones.
+    """
+    if version(path) == 1:
+        with open(path, "rb") as f:
+            return pkl.load(f)
+
+    with open(path, "rb") as f:
+        _, ver, size = _PREFIX.unpack(f.read(_PREFIX.size))
+        if ver > VERSION:
+            raise ValueError(f"rsvr: {path} is version {ver}, newer than {VERSION}")
+        header = json.loads(f.read(size))
+
+        # one map for the whole file, so a load holds one descriptor, not one per array
+        mapped = _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_COPY) if mmap else None
+
+        arrays = {}
+        for name, info in header["arrays"].items():
+            dtype, shape = np.dtype(info["dtype"]), tuple(info["shape"])
+            count = int(np.prod(shape))
+            if mapped is not None and count > 0:
+                arrays[name] = np.frombuffer(
+                    mapped, dtype, count=count, offset=info["offset"]
+                ).reshape(shape)
+            else:
+                f.seek(info["offset"])
+                arrays[name] = np.fromfile(f, dtype, count=count).reshape(shape)
+
+    m = {k: _unflatten(k, e, arrays) for k, e in header["matrices"].items()}
+    res = cls(
+        m["A"],
+        m["B"],
+        m.get("r_init"),
+        m["x_init"],
+        header["global_timescale"],
+        header["gamma"],
+        d=m.get("d"),
+        W=m.get("W"),
+        name=header["name"],
+        input_names=header["input_names"],
+        output_names=header["output_names"],
+        r=m.get("r"),
+    )
+    res.usedInputs = set(header["used_inputs"])
+    res.usedOutputs = set(header["used_outputs"])
+    res.solve_info = header["solve_info"]
+    return res
+
+
+def migrate(directory, dry_run=False) -> list:
+    """Rewrites every v1 (pickled) .rsvr file in directory as v2."""
+    migrated = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.rsvr"))):
+        if version(path) != 1:
+            continue
+        if not dry_run:
+            with open(path, "rb") as f:
+                write(pkl.load(f), path)
+        migrated.append(path)
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Migrates pickled (v1) .rsvr presets to the v2 format"
+    )
+    parser.add_argument("directory", nargs="?", default="src/_std/presets")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    for path in migrate(args.directory, args.dry_run):
+        print(("would migrate" if args.dry_run else "migrated"), path)
@@ -0,0 +1,272 @@
+""" NumPy/SymPy port of the MATLAB runMethod pipeline in matlab_dependencies """
+
+import hashlib
+from collections import OrderedDict
+from dataclasses import dataclass
+from functools import lru_cache
+import numpy as np
+import sympy as sp
+
+"""
+Solving programs a base RNN (A = 0, random B and fixed point rs) to evaluate a
+system of polynomial equations. The RNN's response is expanded in a polynomial
+basis of its inputs (dNPL), the equations are written in the same basis, and
+the readout W maps one onto the other. Outputs that feed back into inputs
+(recurrences) are then internalized into A.
+
+Monomials are rows of Pd1: powers of each of the m inputs, ordered by degree.
+"""
+
+# order of the Taylor series in the inputs; the basis holds monomials of degree < ORDER
+ORDER = 4
+
+# bump whenever a change alters solve results, so cached solves are not reused
+VERSION = 2
+
+# number of basis factorizations (one per base RNN) kept by readout
+READOUT_CACHE_SIZE = 32
+
+
+def decomp_poly1_ns(m: int, o: int = ORDER) -> np.ndarray:
+    """
+    Polynomial basis of decomp_poly1_ns.m: p x m powers of every monomial in m
+    inputs of degree below o, sorted (stably) by degree and then by max power.
+    runMethod only uses the coefficients C1 for their shape (N x p), so they are
+    not computed here.
+    """
+    eye = np.eye(m, dtype=int)
+    pd1 = eye
+    for _ in range(2, o):
+        # every monomial times every input, grouped by input as in the MATLAB reshape
+        pdp = np.vstack([pd1 + eye[j] for j in range(m)])
+        stacked = np.vstack([pd1, pdp])
+        _, first = np.unique(stacked, axis=0, return_index=True)
+        pd1 = stacked[np.sort(first)]
+
+    pd1 = np.vstack([np.zeros((1, m), dtype=int), pd1])
+    s1 = np.argsort(pd1.max(axis=1), kind="stable")
+    s1 = s1[np.argsort(pd1[s1].sum(axis=1), kind="stable")]
+    return pd1[s1]
+
+
+def shift_matrix(pd1: np.ndarray) -> np.ndarray:
+    """
+    PdS of runMethod.m: PdS[i, j] is the (1-based) row of Pd1 holding the product
+    of monomials i and j, or 0 where the product leaves the basis.
+    """
+    degree = pd1.sum(axis=1)
+    inside = degree[:, None] + degree[None, :] <= degree.max()
+
+    # powers stay below max degree + 1, so base (max degree + 1) codes never
+    # carry and the code of a product is the sum of the codes
+    code = pd1 @ (degree.max() + 1) ** np.arange(pd1.shape[1])
+    order = np.argsort(code)
+    product = code[:, None] + code[None, :]
+    rows = order[np.searchsorted(code, product, sorter=order).clip(max=len(code) - 1)]
+
+    return np.where(inside, rows + 1, 0)
+
+
+@dataclass(frozen=True)
+class BasisTables:
+    """
+    Index tables of the polynomial basis for m inputs and a Taylor order, which
+    depend on nothing else. The product of non-constant monomial columns
+    c[left] * c[right] lands in column targets[t] for the pairs
+    starts[t]:starts[t + 1], in the column-major order of MATLAB's find.
+    Column indices exclude the constant monomial, as in gen_basis.m.
+    """
+
+    pd1: np.ndarray
+    pds: np.ndarray
+    left: np.ndarray
+    right: np.ndarray
+    targets: np.ndarray
+    starts: np.ndarray
+
+
+@lru_cache(maxsize=None)
+def basis_tables(m: int, o: int = ORDER) -> BasisTables:
+    """Builds (once per (m, o)) the read-only basis tables."""
+    pd1 = decomp_poly1_ns(m, o)
+    pds = shift_matrix(pd1)
+
+    pdsr = pds[1:, 1:] - 1
+    left, right = np.nonzero(pdsr > 0)
+    into = pdsr[left, right] - 1
+    pairs = np.lexsort((left, right, into))
+    left, right, into = left[pairs], right[pairs], into[pairs]
+    targets, starts = np.unique(into, return_index=True)
+
+    tables = BasisTables(pd1, pds, left, right, targets, starts)
+    for table in vars(tables).values():
+        table.setflags(write=False)
+    return tables
+
+
+def tanh_deriv(d: np.ndarray, n: int) -> np.ndarray:
+    """N x n matrix of tanh and its first n - 1 derivatives at d."""
+    assert 1 <= n <= 5, "tanh_deriv: only derivatives up to order 4 are supported"
+    t = np.tanh(np.asarray(d, dtype=float).reshape(-1))
+    s = 1 - t**2
+    D = np.stack(
+        [t, s, -2 * t * s, (6 * t**2 - 2) * s, (16 * t - 24 * t**3) * s], axis=1
+    )
+    return D[:, :n]
+
+
+def eqs_py2mat(sym_eqs):
+    """
+    Splits sympy equations as eqs_py2mat.m does.
+
+    Returns:
+        (rhs expressions, recurrences as (output, input) 0-based index pairs,
+        input symbols sorted by name)
+    """
+    x = sorted({s for eq in sym_eqs for s in eq.rhs.free_symbols}, key=str)
+    recurrences = [(i, x.index(eq.lhs)) for i, eq in enumerate(sym_eqs) if eq.lhs in x]
+    return [eq.rhs for eq in sym_eqs], recurrences, x
+
+
+def compile_eqs(dx, x, pd1: np.ndarray) -> np.ndarray:
+    """
+    Coefficients of each expression in dx over the monomials of Pd1, as in
+    compile.m. Terms outside the basis are dropped.
+    """
+    index = {tuple(row): i for i, row in enumerate(pd1)}
+    DX = np.zeros((len(dx), pd1.shape[0]))
+    for i, expr in enumerate(dx):
+        # exact rationals, like MATLAB's sym conversion, keep the expansion exact
+        poly = sp.Poly(sp.nsimplify(sp.expand(expr), rational=True), *x)
+        for powers, coeff in poly.terms():
+            if powers in index:
+                DX[i, index[powers]] = float(coeff)
+    return DX
+
+
+def gen_basis(Aa: np.ndarray, tables: BasisTables) -> np.ndarray:
+    """
+    Taylor expansion of tanh(A r + B x + d) in the polynomial basis (gen_basis.m).
+
+    Args:
+        Aa: N x p coefficients of A r + B x + d in the basis.
+        tables: basis_tables of the input dim.
+
+    Returns:
+        N x p basis representation of tanh(A r + B x + d).
+    """
+    D = tanh_deriv(Aa[:, 0], 5)
+    Ac = Aa[:, 1:]
+
+    def shift(P):
+        # gather every monomial pair, then sum each product column's pairs
+        out = np.zeros(Ac.shape)
+        if len(tables.targets):
+            terms = P[:, tables.left] * Ac[:, tables.right]
+            out[:, tables.targets] = np.add.reduceat(terms, tables.starts, axis=1)
+        return out
+
+    Ac2 = shift(Ac)
+    Ac3 = shift(Ac2)
+    Ac4 = shift(Ac3)
+
+    return np.hstack(
+        [
+            D[:, [0]],
+            D[:, [1]] * Ac
+            + D[:, [2]] * Ac2 / 2
+            + D[:, [3]] * Ac3 / 6
+            + D[:, [4]] * Ac4 / 24,
+        ]
+    )
+
+
+class Readout:
+    """
+    Thin SVD R.T = U S Vt of a basis R (N x p), which solves W @ R = O for any
+    target O with two thin products instead of a fresh least squares solve.
+    """
+
+    def __init__(self, R: np.ndarray):
+        self.U, self.s, self.Vt = np.linalg.svd(R.T, full_matrices=False)
+        # same cutoff as np.linalg.lstsq: singular values below eps * max(N, p)
+        self.rank = int(np.sum(self.s > np.finfo(float).eps * max(R.shape) * self.s[0]))
+
+    def solve(self, O: np.ndarray, ridge: float = 0.0) -> np.ndarray:
+        """
+        Minimum-norm least squares W with W @ R = O, or with ridge > 0 the
+        minimizer of |W R - O|^2 + ridge |W|^2.
+        """
+        s = self.s[: self.rank] if ridge == 0 else self.s
+        f = 1 / s if ridge == 0 else s / (s**2 + ridge)
+        U, Vt = self.U[:, : len(s)], self.Vt[: len(s)]
+        return ((O @ U) * f) @ Vt
+
+
+_readouts = OrderedDict()
+
+
+def readout(R: np.ndarray) -> Readout:
+    """Factorization of R, reused for every basis with the same contents."""
+    R = np.ascontiguousarray(R, dtype=float)
+    key = (R.shape, hashlib.sha1(R.tobytes()).hexdigest())
+    if key in _readouts:
+        _readouts.move_to_end(key)
+        return _readouts[key]
+
+    _readouts[key] = Readout(R)
+    if len(_readouts) > READOUT_CACHE_SIZE:
+        _readouts.popitem(last=False)
+    return _readouts[key]
+
+
+def run_method(A, B, rs, xs, dt, gam, sym_eqs, verbose=False, ridge=0.0):
+    """
+    Port of runMethod.m: programs the base RNN (A, B, rs, xs) with sym_eqs.
+
+    Returns:
+        (A, B, rs, xs, d, O, R) as runMethod, with recurrences internalized into A
+        and their inputs removed from B and xs. O and R are the dNPL target and
+        basis, so that W solves W @ R = O (with ridge, as in Readout.solve).
+    """
+    A = np.asarray(A, dtype=float)
+    B = np.asarray(B, dtype=float)
+    rs = np.asarray(rs, dtype=float).reshape(-1, 1)
+    xs = np.asarray(xs, dtype=float).reshape(-1, 1)
+    m = xs.shape[0]
+
+    d = np.arctanh(rs) - A @ rs - B @ xs
+
+    tables = basis_tables(m)
+    pd1 = tables.pd1
+
+    output_eqs, recurrences, x = eqs_py2mat(sym_eqs)
+    assert len(x) == m, "run_method: equations and base RNN have different inputs"
+    DX = compile_eqs(output_eqs, x, pd1)
+
+    # A r + B x + d in the basis: d on the constant, B on the linear monomials
+    Aa = np.zeros((A.shape[0], pd1.shape[0]))
+    Aa[:, 1 : m + 1] += B
+    Aa[:, 0] += d.reshape(-1)
+    R = gen_basis(Aa, tables)
+
+    # recurrent outputs carry their own input forward
+    o = np.zeros((len(output_eqs), pd1.shape[0]))
+    for out_idx, in_idx in recurrences:
+        o[out_idx, 1 + in_idx] = 1
+    O = o + DX
+
+    W = readout(R).solve(O, ridge)
+    if verbose:
+        print(f"Compiler residual: {np.linalg.norm(W @ R - O):.6g}")
+
+    # internalize recurrences into A and splice their inputs out of B
+    for out_idx, in_idx in recurrences:
+        A = A + np.outer(B[:, in_idx], W[out_idx, :])
+    keep = [i for i in range(m) if i not in {in_idx for _, in_idx in recurrences}]
+    if keep:
+        B, xs = B[:, keep], xs[keep]
+    else:
+        B, xs = np.zeros((B.shape[0], 1)), np.zeros((1, 1))
+
+    return A, B, rs, xs, d, O, R
@@ -5,6 +5,7 @@ from ir.lang import Prog, Expr, Opc, Operand
 from _cgraph.cgraph import CGraph
 from ir.fn_library import rnn_lib
 from _prnn.reservoir import Reservoir
+from _prnn import presets
 
 
 class Core:
@@ -115,7 +116,7 @@ class Core:
         assert isinstance(opcode, str), "Custom opcode must be a string"
 
         _, _, res = self._res_from_lib(opcode)
-        self.graph.add_reservoir(res.name, reservoir=res)
+        self.graph.add_reservoir(res.name, reservoir=res, fn=opcode)
         # Check operands
         operands = expr.operands
         for i, sym in enumerate(operands):
@@ -150,7 +151,7 @@ class Core:
             if self.verbose:
                 print(f"Found opcode {opcode} in rnn_lib")
             inp_dim, out_dim, res_path = rnn_lib[opcode]
-            res = Reservoir.load(res_path).copy()
+            res = presets.load(res_path).copy()
             res.name = self._generate_uid()
             if self.verbose:
                 print(
@@ -1,8 +1,30 @@
-from _frontend.res_ast import ASTGenerator
-from _frontend.ast_compiler import ASTCompiler
 from _prnn.reservoir import Reservoir
 
 
-def compile(path: str, verbose=False) -> Reservoir:
+def compile(
+    path: str, verbose=False, track_time=False, cache=False, workers=1, optimize=False
+) -> Reservoir:
+    """
+    Compiles a .pyres file to a reservoir. With cache (True for the default
+    build cache, or a SolveCache), functions unchanged since an earlier build
+    with the same compiler reuse their resolved reservoirs; without it nothing
+    is written to disk. workers > 1 (or None, for
+    every core) resolves independent functions concurrently. optimize removes
+    the reservoirs, outputs and neurons no return depends on, and allows unused
+    variables.
+    """
+    # the frontend (and networkx with it) loads on the first compile, so that
+    # importing pyres to load and run presets stays cheap
+    from _frontend.res_ast import ASTGenerator
+    from _frontend.ast_compiler import ASTCompiler
+
     ast = ASTGenerator().read_and_parse(path)
-    return ASTCompiler(verbose=verbose, file=path).compile(ast)
+    compiler = ASTCompiler(
+        verbose=verbose,
+        track_time=track_time,
+        file=path,
+        build_cache=cache or None,
+        workers=workers,
+        optimize=optimize,
+    )
+    return compiler.compile(ast)
@@ -6,6 +6,8 @@ import pytest
 import numpy as np
 import sympy as sp
 from _prnn.reservoir import Reservoir
+from _prnn.cache import SolveCache
+from _prnn import solver
 
 
 def compare_reservoirs(res1: Reservoir, res2: Reservoir, tol: float = 1e-8) -> bool:
@@ -58,3 +60,142 @@ def test_nand_gate():
         compare_reservoirs(reservoir, reference_res) is True
     ), "Failed to properly generate 'AND' gate"
 
+
+o1, o2, o3, s, s1, s2, s3 = sp.symbols("o1 o2 o3 s s1 s2 s3")
+
+
+@pytest.mark.parametrize(
+    "name, eqs",
+    [
+        (
+            "lorenz",
+            [
+                sp.Eq(o1, o2 - o1),
+                sp.Eq(o2, 1 / 10 * o1 - 1 / 10 * o2 - 20 * o1 * o3),
+                sp.Eq(o3, 20 * o1 * o2 - 4 / 15 * o3 - 0.036),
+            ],
+        ),
+        ("rotation90", [sp.Eq(o1, -s2), sp.Eq(o2, s1), sp.Eq(o3, s3)]),
+        ("fan", [sp.Eq(o1, s), sp.Eq(o2, o1)]),
+    ],
+)
+def test_numpy_backend_matches_presets(name, eqs):
+    reservoir = Reservoir.solve(eqs, backend="numpy")
+    reference_res = Reservoir.load(name)
+
+    compare_reservoirs(reservoir, reference_res)
+    # W is large for recurrent systems, so compare it relative to its scale
+    assert np.allclose(
+        reservoir.W, reference_res.W, rtol=0, atol=1e-10 * np.abs(reference_res.W).max()
+    )
+    assert np.allclose(reservoir.d, reference_res.d, atol=1e-12)
+
+
+def test_solve_cache_hits_and_evicts(tmp_path):
+    cache = SolveCache(str(tmp_path), max_bytes=1)
+    eqs = [sp.Eq(o1, -s2), sp.Eq(o2, s1), sp.Eq(o3, s3)]
+
+    solved = Reservoir.solve(eqs, cache=cache)
+    cached = Reservoir.solve(eqs, cache=cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cached is not solved and np.array_equal(cached.W, solved.W)
+
+    # any change to the equations is a new entry, which evicts the older one
+    Reservoir.solve([sp.Eq(o1, s2), sp.Eq(o2, s1), sp.Eq(o3, s3)], cache=cache)
+    assert cache.misses == 2 and cache.evictions == 1
+    assert cache.stats()["entries"] == 1
+
+
+def test_solve_many_matches_serial_solves():
+    xw = 0.025
+    systems = []
+    for xf in [0.08, 0.1, 0.12]:
+        cx = 3 / 13
+        pitchfork = (-cx / (3 * xw**2)) * o1**3 + cx * o1
+        logic = -0.1 + (s1 + xf) * (s2 + xf) / (2 * xf)
+        systems.append([sp.Eq(o1, 0.1 * (pitchfork + logic))])
+
+    results = dict(Reservoir.solve_many(systems, workers=2, seed=[0, 1, 2]))
+
+    assert sorted(results) == [0, 1, 2]
+    for i, eqs in enumerate(systems):
+        compare_reservoirs(results[i], Reservoir.solve(eqs, seed=i), tol=0)
+
+
+def test_solve_minimal_finds_smallest_latent_dim():
+    eqs = [sp.Eq(o1, -s2), sp.Eq(o2, s1), sp.Eq(o3, s3)]
+
+    reservoir = Reservoir.solve_minimal(eqs, tol=1e-6)
+    info = reservoir.solve_info
+
+    # 3 inputs give 20 monomials of degree < 4, which fix the residual's floor
+    assert reservoir.A.shape == (20, 20) and info["latent_dim"] == 20
+    assert info["residual"] <= 1e-6 and info["verify_error"] <= 1e-2
+    assert info["searched"][19][0] > 1e-6
+
+
+def test_readout_factorization_is_shared_by_a_gate_family():
+    xw, xf, cx = 0.025, 0.1, 3 / 13
+    pitchfork = (-cx / (3 * xw**2)) * o1**3 + cx * o1
+    gates = [
+        -0.1 + (s1 + xf) * (s2 + xf) / (2 * xf),
+        0.1 + (s1 + xf) * (-s2 - xf) / (2 * xf),
+    ]
+
+    # both gates use the same base RNN, so R is factorized only once
+    solver._readouts.clear()
+    solved = [Reservoir.solve([sp.Eq(o1, 0.1 * (pitchfork + g))]) for g in gates]
+    assert len(solver._readouts) == 1
+
+    # ridge trades residual for a smaller readout
+    ridged = Reservoir.solve([sp.Eq(o1, 0.1 * (pitchfork + gates[0]))], ridge=1e-8)
+    assert np.abs(ridged.W).max() < np.abs(solved[0].W).max()
+
+
+def find_shift_matrix(pd1: np.ndarray) -> np.ndarray:
+    """PdS as runMethod.m builds it, one find per product inside the basis."""
+    degree = pd1.sum(axis=1)
+    pds = np.zeros((len(pd1), len(pd1)), dtype=int)
+    for i, j in zip(*np.nonzero(degree[:, None] + degree[None, :] <= degree.max())):
+        (row,) = np.nonzero((pd1 == pd1[i] + pd1[j]).all(axis=1))
+        pds[i, j] = row[0] + 1
+    return pds
+
+
+def loop_gen_basis(Aa: np.ndarray, pds: np.ndarray) -> np.ndarray:
+    """gen_basis.m, one find over PdS per column of every shift."""
+    D = solver.tanh_deriv(Aa[:, 0], 5)
+    Ac = Aa[:, 1:]
+    pdsr = pds[1:, 1:] - 1
+
+    def shift(P):
+        out = np.zeros(Ac.shape)
+        for i in range(Ac.shape[1]):
+            Fj, Fi = np.nonzero(pdsr.T == i + 1)
+            out[:, i] = (P[:, Fi] * Ac[:, Fj]).sum(axis=1)
+        return out
+
+    Ac2 = shift(Ac)
+    Ac3 = shift(Ac2)
+    Ac4 = shift(Ac3)
+    return np.hstack(
+        [
+            D[:, [0]],
+            D[:, [1]] * Ac
+            + D[:, [2]] * Ac2 / 2
+            + D[:, [3]] * Ac3 / 6
+            + D[:, [4]] * Ac4 / 24,
+        ]
+    )
+
+
+@pytest.mark.parametrize("m", [1, 2, 3, 4])
+def test_basis_tables_match_matlab_construction(m):
+    tables = solver.basis_tables(m)
+
+    assert np.array_equal(tables.pds, find_shift_matrix(solver.decomp_poly1_ns(m)))
+
+    Aa = np.random.default_rng(m).normal(scale=0.5, size=(30, len(tables.pd1)))
+    assert np.allclose(
+        solver.gen_basis(Aa, tables), loop_gen_basis(Aa, tables.pds), atol=1e-12
+    )
@@ -0,0 +1,199 @@
+"""
+Checks that sparse and structured composites match their dense counterparts.
+"""
+
+import os
+import pickle
+import numpy as np
+import pytest
+from _cgraph.optimize import eliminate_dead
+from _cgraph.resolve import Resolver
+from _prnn import operators, rsvr
+from _prnn.circuit import Circuit
+from _prnn.operators import BlockLowRank
+from _prnn.reservoir import Reservoir
+from _utils import inputs
+from ir.core import Core, Expr, Opc
+from ir.lang import Prog
+
+
+def nand_chain_graph(n):
+    """o_i = NAND(o_{i-1}, i_i), with o_0 = NAND(i_0, i_1)"""
+    names = [f"i{i}" for i in range(n + 1)]
+    exprs = [Expr(Opc.INPUT, [names]), Expr(Opc.LET, [["o0"], Expr("NAND", names[:2])])]
+    for i in range(1, n):
+        exprs.append(
+            Expr(Opc.LET, [[f"o{i}"], Expr("NAND", [f"o{i-1}", names[i + 1]])])
+        )
+    exprs.append(Expr(Opc.RET, [[f"o{n - 1}"]]))
+    return Core(Prog(exprs)).compile_to_cgraph()
+
+
+def nand_chain_circuit(n, a_format):
+    gates = [Reservoir.load("nand") for _ in range(n)]
+    config = [[gates[i], 1, gates[i + 1], 1] for i in range(n - 1)]
+    return Circuit(config, reservoirs=gates, a_format=a_format).connect()
+
+
+def assert_same_composite(dense, sparse):
+    assert isinstance(dense.A, np.ndarray)
+    for name in ["A", "B", "W"]:
+        m = getattr(sparse, name)
+        assert not isinstance(m, np.ndarray), f"{name} should be sparse"
+        assert np.array_equal(m.toarray(), getattr(dense, name))
+    assert np.array_equal(sparse.d, dense.d)
+    assert np.array_equal(sparse.x_init, dense.x_init)
+
+
+@pytest.mark.parametrize("build", ["resolver", "circuit"])
+def test_sparse_composite_matches_dense(build):
+    if build == "resolver":
+        dense = Resolver(nand_chain_graph(12), a_format="dense").resolve()
+        sparse = Resolver(nand_chain_graph(12), a_format="sparse").resolve()
+    else:
+        dense = nand_chain_circuit(12, "dense")
+        sparse = nand_chain_circuit(12, "sparse")
+    assert_same_composite(dense, sparse)
+
+    pattern = np.tile(inputs.high_low_inputs(1000), (7, 1))[: dense.B.shape[1]]
+    dense.r, sparse.r = dense.r_init.copy(), sparse.r_init.copy()
+    # same rounding caveat as run_batch, compounded along the chain of gates:
+    # sparse and dense matvecs sum in a different order
+    assert np.allclose(sparse.run(pattern), dense.run(pattern), atol=5e-4)
+
+
+def test_auto_format_goes_sparse_for_large_circuits():
+    assert isinstance(nand_chain_circuit(2, "auto").A, np.ndarray)
+    assert not isinstance(nand_chain_circuit(20, "auto").A, np.ndarray)
+
+
+@pytest.mark.parametrize("build", ["resolver", "circuit"])
+def test_lowrank_composite_keeps_structure(build):
+    if build == "resolver":
+        dense = Resolver(nand_chain_graph(12), a_format="dense").resolve()
+        lowrank = Resolver(nand_chain_graph(12), a_format="lowrank").resolve()
+    else:
+        dense = nand_chain_circuit(12, "dense")
+        lowrank = nand_chain_circuit(12, "lowrank")
+
+    # one block per gate and one rank-1 coupling per internalized connection
+    assert isinstance(lowrank.A, BlockLowRank)
+    assert len(lowrank.A.blocks) == 12 and lowrank.A.rank == 11
+    assert np.array_equal(lowrank.A.toarray(), dense.A)
+
+    pattern = np.tile(inputs.high_low_inputs(1000), (7, 1))[: dense.B.shape[1]]
+    dense.r, lowrank.r = dense.r_init.copy(), lowrank.r_init.copy()
+    assert np.allclose(lowrank.run(pattern), dense.run(pattern), atol=5e-4)
+
+
+@pytest.mark.parametrize("a_format", ["dense", "sparse", "lowrank"])
+def test_rsvr_round_trip_keeps_format(tmp_path, a_format):
+    res = nand_chain_circuit(4, a_format)
+    res.save("chain", directory=str(tmp_path))
+    assert rsvr.version(tmp_path / "chain.rsvr") == rsvr.VERSION
+
+    for mmap in [True, False]:
+        loaded = Reservoir.load("chain", directory=str(tmp_path), mmap=mmap)
+        assert type(loaded.A) is type(res.A)
+        for name in ["A", "B", "W", "d", "r_init", "x_init", "r"]:
+            m, ref = getattr(loaded, name), getattr(res, name)
+            assert np.array_equal(operators.toarray(m), operators.toarray(ref)), name
+
+    # pickled (v1) files still load, and migrate converts them in place
+    with open(tmp_path / "old.rsvr", "wb") as f:
+        pickle.dump(res, f)
+    assert rsvr.migrate(str(tmp_path)) == [str(tmp_path / "old.rsvr")]
+    migrated = Reservoir.load("old", directory=str(tmp_path))
+    assert np.array_equal(migrated.d, res.d)
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_loads_hold_at_most_one_open_file_each():
+    def open_files():
+        return len(os.listdir("/proc/self/fd"))
+
+    before = open_files()
+    read = [Reservoir.load("nand") for _ in range(100)]
+    assert open_files() == before
+
+    mapped = [Reservoir.load("nand", mmap=True) for _ in range(100)]
+    assert open_files() <= before + len(mapped)
+    assert np.array_equal(mapped[0].A, read[0].A)
+
+
+def test_circuit_removes_every_used_input_of_a_gate():
+    # both inputs of the last gate are driven by the first two
+    gates = [Reservoir.load("nand") for _ in range(3)]
+    config = [[gates[0], 1, gates[2], 1], [gates[1], 1, gates[2], 2]]
+    res = Circuit(config, reservoirs=gates).connect()
+
+    assert res.B.shape[1] == res.x_init.shape[0] == 4
+    assert res.W.shape[0] == 1
+
+
+def test_optimize_removes_dead_reservoirs_and_outputs():
+    # the sandbox's reference lorenz is never returned, nor is one rotated output
+    def lorenz_graph(reference):
+        exprs = [Expr(Opc.LET, [["l1a", "l2a", "l3a"], Expr("LORENZ", [])])]
+        exprs = exprs if reference else []
+        exprs += [
+            Expr(Opc.LET, [["l1", "l2", "l3"], Expr("LORENZ", [])]),
+            Expr(Opc.LET, [["r1", "r2", "r3"], Expr("ROTATE90", ["l1", "l2", "l3"])]),
+            Expr(Opc.RET, [["r1", "r2", "r3"] if not reference else ["r1", "r2"]]),
+        ]
+        return Core(Prog(exprs)).compile_to_cgraph()
+
+    # the graph pass on its own, without the rest of Resolver(optimize=True)
+    graph = lorenz_graph(True)
+    report = eliminate_dead(graph)
+    optimized = Resolver(graph).resolve()
+    reference = Resolver(lorenz_graph(False)).resolve()
+
+    assert report["reservoirs"] == 1 and report["outputs"] == 1
+    assert report["neurons"] == optimized.A.shape[0] // 2
+    assert optimized.A.shape == reference.A.shape
+    assert optimized.output_names == ["r1", "r2"]
+
+    void = inputs.zeros(500)
+    assert np.array_equal(optimized.run(void), reference.run(void)[:2])
+
+
+def test_optimize_merges_identical_calls():
+    def graph(repeat):
+        exprs = [
+            Expr(Opc.INPUT, [["i1", "i2"]]),
+            Expr(Opc.LET, [["x"], Expr("NAND", ["i1", "i2"])]),
+            Expr(
+                Opc.LET, [["y"], Expr("NAND", ["i1", "i2"] if repeat else ["i2", "i1"])]
+            ),
+            Expr(Opc.RET, [["x", "y"]]),
+        ]
+        return Core(Prog(exprs)).compile_to_cgraph()
+
+    resolver = Resolver(graph(True), optimize=True)
+    merged = resolver.resolve()
+    assert resolver.report["cse"]["reservoirs"] == 1
+    assert merged.A.shape[0] == resolver.report["cse"]["neurons"]
+    assert merged.W.shape[0] == 2 and merged.output_names == ["x", "y"]
+
+    # swapped arguments are a different call
+    assert (
+        Resolver(graph(False), optimize=True).resolve().A.shape[0]
+        == 2 * merged.A.shape[0]
+    )
+
+    y = merged.run(inputs.high_low_inputs(500))
+    assert np.array_equal(y[0], y[1])
+
+
+def test_merged_calls_keep_readout_order():
+    exprs = [
+        Expr(Opc.LET, [["l1", "l2", "l3"], Expr("LORENZ", [])]),
+        Expr(Opc.LET, [["m1", "m2", "m3"], Expr("LORENZ", [])]),
+        Expr(Opc.RET, [["l3", "m1"]]),
+    ]
+    res = Resolver(Core(Prog(exprs)).compile_to_cgraph(), optimize=True).resolve()
+    assert res.output_names == ["l3", "m1"]
+
+    lorenz = Reservoir.load("lorenz")
+    assert np.array_equal(operators.toarray(res.W), lorenz.W[[2, 0]])
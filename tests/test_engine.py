@@ -0,0 +1,180 @@
+"""
+Checks the simulation engine modes against the reference single-trajectory run.
+"""
+
+import numpy as np
+import pytest
+from _prnn.reduce import prune
+from _prnn.reservoir import Reservoir
+from _utils import inputs
+
+
+def test_run_batch_matches_run():
+    res = Reservoir.load("nand")
+    patterns = np.stack([inputs.high_low_inputs(400), -inputs.high_low_inputs(400)])
+
+    batched = res.run_batch(patterns)
+
+    assert batched.shape == (2, res.W.shape[0], 400)
+    # gate adjacencies are large and cancel heavily, so matrix-matrix and
+    # matrix-vector products only agree to a few ulps of A @ r per step
+    for i, pattern in enumerate(patterns):
+        single = Reservoir.load("nand").run(pattern)
+        assert np.allclose(batched[i], single, atol=1e-4)
+
+
+def test_run_matches_propagate():
+    res = Reservoir.load("nor_triple")
+    pattern = inputs.high_low_inputs(200)
+
+    ref = Reservoir.load("nor_triple")
+    states = [ref.r.flatten()]
+    for i in range(1, pattern.shape[1]):
+        ref.propagate(np.repeat(pattern[:, i - 1 : i], 4, axis=1))
+        states.append(ref.r.flatten())
+
+    # run precomputes B @ x + d, which only reorders the rounding of each stage
+    assert np.allclose(
+        res.run(pattern, ret_states=True), np.stack(states, axis=1), atol=1e-9
+    )
+    assert np.allclose(res.r, ref.r, atol=1e-9)
+
+
+def test_rk4_step_matches_hand_computed_value():
+    # dr/dt = gamma * (tanh(d) - r) is linear, so one RK4 step from r = 0 is
+    # tanh(d) * (1 - (1 - z + z^2/2 - z^3/6 + z^4/24)), with z = gamma * dt
+    res = Reservoir(
+        np.zeros((1, 1)),
+        np.zeros((1, 1)),
+        None,
+        np.zeros((1, 1)),
+        global_timescale=0.001,
+        gamma=100,
+        d=np.array([[np.arctanh(0.5)]]),
+        W=np.eye(1),
+        r=np.zeros((1, 1)),
+    )
+    expected = 0.5 * (0.1 - 0.1**2 / 2 + 0.1**3 / 6 - 0.1**4 / 24)  # 0.04758125
+
+    assert np.isclose(res.run(np.zeros((1, 2)))[0, 1], expected, rtol=1e-12)
+    res.r = np.zeros((1, 1))
+    res.propagate(np.zeros((1, 1, 4)))
+    assert np.isclose(res.r[0, 0], expected, rtol=1e-12)
+
+
+def test_run_iter_matches_run():
+    pattern = inputs.high_low_inputs(1000)
+    full = Reservoir.load("nand").run(pattern)
+
+    res = Reservoir.load("nand")
+    stream = (pattern[:, i : i + 300] for i in range(0, 1000, 300))
+    blocks = list(res.run_iter(stream, chunk=128))
+
+    assert max(block.shape[1] for block in blocks) <= 128
+    assert np.allclose(np.hstack(blocks), full, atol=1e-12)
+
+
+def test_run_to_file_resumes_from_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr("_prnn.reservoir.DRIVE_CHUNK", 100)
+    pattern = inputs.high_low_inputs(1000)
+    path = str(tmp_path / "states.npy")
+    full = Reservoir.load("nand").run(pattern, ret_states=True)
+
+    res = Reservoir.load("nand")
+    recorded = res.run(pattern, ret_states=True, out_path=path)
+    assert np.allclose(np.load(path), full, atol=1e-12)
+
+    # simulate a crash after 400 columns: later columns never reached the disk
+    recorded[:, 400:] = 0
+    recorded.flush()
+    np.savez(path + ".ckpt.npz", col=400, r=full[:, 400])
+
+    resumed = Reservoir.load("nand").run(
+        pattern, ret_states=True, out_path=path, resume=True
+    )
+    assert np.allclose(resumed, full, atol=1e-12)
+
+
+def test_dopri5_matches_rk4_with_fewer_evaluations():
+    pattern = inputs.high_low_inputs(4000)
+    ref = Reservoir.load("nand").run(pattern)
+
+    res = Reservoir.load("nand")
+    out = res.run(pattern, method="dopri5", rtol=1e-6, atol=1e-9)
+
+    # the gate settles between input switches, so far fewer evaluations than rk4
+    rk4_fev = 4 * (pattern.shape[1] - 1)
+    assert np.allclose(out, ref, atol=1e-3)
+    assert res.run_stats["fev"] < rk4_fev / 4
+
+
+@pytest.mark.parametrize(
+    "name, steps, stride, atol",
+    # lorenz is chaotic, so only the first 500 steps (as in etd_accuracy.py)
+    # are comparable pointwise, and only at small strides
+    [
+        ("lorenz", 500, 2, 5e-3),
+        ("nand", 4000, 10, 1e-3),
+        ("nor_triple", 4000, 10, 1e-3),
+    ],
+)
+def test_etdrk4_matches_rk4_on_coarse_grid(name, steps, stride, atol):
+    res = Reservoir.load(name)
+    pattern = inputs.high_low_inputs(steps)[: res.B.shape[1]]
+    ref = Reservoir.load(name).run(pattern)
+
+    out = res.run(pattern, method="etdrk4", stride=stride)
+
+    assert out.shape == ref[:, ::stride].shape
+    assert np.allclose(out, ref[:, ::stride], atol=atol)
+    assert res.run_stats["fev"] == 4 * ((steps - 1) // stride)
+
+
+@pytest.mark.parametrize("stride", [5, 10, 20])
+def test_etdrk4_rejects_unstable_strides(stride):
+    res = Reservoir.load("lorenz")
+    with pytest.raises(ValueError, match="unstable"):
+        res.run(inputs.zeros(500), method="etdrk4", stride=stride)
+
+
+def test_prune_reports_error_of_the_reduced_reservoir():
+    res = Reservoir.load("rotation90")
+    pattern = 0.1 * np.sin(np.linspace(0, 20, 1500) + np.arange(3).reshape(-1, 1))
+    r0 = res.r.copy()
+
+    reduced, report = prune(res, pattern, tol=1e-2)
+
+    assert np.array_equal(res.r, r0)
+    assert report["kept"] == reduced.A.shape[0] < report["neurons"] == 30
+    assert report["relative_error"] <= 1e-2
+
+    ref = Reservoir.load("rotation90").run(pattern)
+    err = np.abs(reduced.run(pattern) - ref).max()
+    assert np.isclose(err, report["max_error"])
+
+
+def test_prune_removes_redundant_neurons():
+    # a nand gate plus neurons driven by its inputs that nothing reads
+    gate = Reservoir.load("nand")
+    n, extra = gate.A.shape[0], 10
+    rng = np.random.default_rng(0)
+    res = Reservoir(
+        np.block([[gate.A, np.zeros((n, extra))], [np.zeros((extra, n + extra))]]),
+        np.vstack([gate.B, rng.normal(size=(extra, gate.B.shape[1]))]),
+        None,
+        gate.x_init,
+        gate.global_timescale,
+        gate.gamma,
+        d=np.vstack([gate.d, np.zeros((extra, 1))]),
+        W=np.hstack([gate.W, np.zeros((gate.W.shape[0], extra))]),
+        r=np.vstack([gate.r, np.zeros((extra, 1))]),
+    )
+    pattern = inputs.high_low_inputs(2000)
+
+    reduced, report = prune(res, pattern, tol=1e-2)
+
+    assert set(range(n, n + extra)) <= set(report["removed"])
+    assert report["kept"] == reduced.A.shape[0] <= n
+    assert report["relative_error"] <= 1e-2
+    err = np.abs(reduced.run(pattern) - Reservoir.load("nand").run(pattern))
+    assert err.max() <= 1e-2 * np.abs(res.run(pattern)).max()
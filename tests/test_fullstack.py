@@ -1,8 +1,16 @@
 import pytest
 import glob
 import os
+import subprocess
+import sys
+import numpy as np
+from _frontend import build_cache as builds
 from _frontend.res_ast import ASTGenerator
 from _frontend.ast_compiler import ASTCompiler
+from _prnn.cache import SolveCache
+from _prnn.presets import PresetCache
+from _prnn.reservoir import Reservoir
+from _utils import inputs
 
 
 def get_pyres_files(path: str):
@@ -14,3 +22,223 @@ def test_fstack(path: str):
     ast = ASTGenerator().read_and_parse(path)
     res = ASTCompiler(track_time=True).compile(ast)
     assert res is not None, "failed to resovle reservoir"
+
+
+def test_presets_are_loaded_once_and_shared(tmp_path):
+    Reservoir.load("nand").save("nand", directory=str(tmp_path))
+    cache = PresetCache()
+
+    first = cache.load("nand", str(tmp_path))
+    second = cache.load("nand", str(tmp_path))
+    assert cache.stats()["loads"] == 1 and cache.stats()["hits"] == 1
+
+    # matrices are shared read-only; state and names are per instance
+    assert first.A is second.A and not first.A.flags.writeable
+    with pytest.raises(ValueError):
+        first.d += 1
+    first.d = first.d + 1
+    first.output_names.append("extra")
+    assert second.output_names == [] and np.array_equal(second.r, first.r)
+
+    # a rewritten file is loaded again
+    path = tmp_path / "nand.rsvr"
+    os.utime(path, ns=(path.stat().st_atime_ns, path.stat().st_mtime_ns + 10**9))
+    third = cache.load("nand", str(tmp_path))
+    assert third.A is not first.A
+    assert cache.stats()["invalidations"] == 1 and cache.stats()["loads"] == 2
+
+
+def test_importing_pyres_leaves_heavy_dependencies_unloaded():
+    heavy = ["matlab", "sympy", "scipy", "networkx", "matplotlib"]
+    script = (
+        "import sys, numpy as np, pyres\n"
+        "res = pyres.Reservoir.load('nand')\n"
+        "res.run(np.zeros((2, 10)))\n"
+        f"print(','.join(m for m in {heavy!r} if m in sys.modules))"
+    )
+    out = subprocess.run(
+        [sys.executable, "-c", script], capture_output=True, text=True, check=True
+    )
+    assert out.stdout.strip() == ""
+
+
+def test_build_cache_reresolves_only_changed_functions(tmp_path):
+    src = open("examples/frontend/src_code/ex1.pyres").read()
+    cache = SolveCache(str(tmp_path / "builds"))
+
+    def build(code):
+        path = tmp_path / "prog.pyres"
+        path.write_text(code)
+        compiler = ASTCompiler(build_cache=cache)
+        res = compiler.compile(ASTGenerator().read_and_parse(str(path)))
+        return res, compiler.build_stats
+
+    first, stats = build(src)
+    assert stats == {"hits": 0, "misses": 2}
+
+    again, stats = build(src)
+    assert stats == {"hits": 2, "misses": 0}
+    assert np.array_equal(again.A, first.A) and np.array_equal(again.W, first.W)
+
+    # editing main keeps helper's build
+    _, stats = build(src.replace("return 0.1 and", "return 0.2 and"))
+    assert stats == {"hits": 1, "misses": 1}
+
+
+def test_build_cache_misses_after_a_resolver_change(tmp_path, monkeypatch):
+    # stands in for the resolver's source, which keys every build
+    resolver = tmp_path / "resolve.py"
+    resolver.write_text("def resolve(): ...\n")
+    monkeypatch.setattr(builds, "resolver_sources", lambda: [str(resolver)])
+
+    cache = SolveCache(str(tmp_path / "builds"))
+    path = tmp_path / "prog.pyres"
+    path.write_text(open("examples/frontend/src_code/ex1.pyres").read())
+
+    def build():
+        compiler = ASTCompiler(build_cache=cache)
+        compiler.compile(ASTGenerator().read_and_parse(str(path)))
+        return compiler.build_stats
+
+    assert build() == {"hits": 0, "misses": 2}
+    assert build() == {"hits": 2, "misses": 0}
+
+    resolver.write_text("def resolve(): return None\n")
+    assert build() == {"hits": 0, "misses": 2}
+
+
+def test_deep_call_chains_resolve_and_recursion_is_reported(tmp_path):
+    defs = ["from pyres import std", "", "def f0(a, b):", "    return std.nand(a, b)"]
+    for i in range(1, 40):
+        defs += [f"def f{i}(a, b):", f"    return f{i - 1}(a, b)"]
+    path = tmp_path / "chain.pyres"
+    path.write_text("\n".join(defs + ["def main(a, b):", "    return f39(a, b)"]))
+    res = ASTCompiler().compile(ASTGenerator().read_and_parse(str(path)))
+    assert res.W.shape[0] == 1
+
+    path.write_text(
+        "\n".join(
+            ["def f(a):", "    return g(a)", "def g(a):", "    return f(a)"]
+            + ["def main(a):", "    return f(a)"]
+        )
+    )
+    with pytest.raises(SyntaxError, match="recursive call to f"):
+        ASTCompiler().compile(ASTGenerator().read_and_parse(str(path)))
+
+
+def test_parallel_resolution_matches_serial(tmp_path):
+    # a diamond of independent functions below main
+    path = tmp_path / "diamond.pyres"
+    path.write_text(
+        "\n".join(
+            [
+                "from pyres import std",
+                "def left(a, b):",
+                "    return std.nand(a, b)",
+                "def right(a, b):",
+                "    x = std.nand(b, a)",
+                "    return std.nand(x, 0.1)",
+                "def top(a, b, c, d):",
+                "    return std.nand(left(a, b), right(c, d))",
+                "def main(a, b, c, d, e, f):",
+                "    return top(a, b, c, d), left(e, f)",
+            ]
+        )
+    )
+    serial = ASTCompiler().compile(ASTGenerator().read_and_parse(str(path)))
+    parallel = ASTCompiler(workers=2).compile(ASTGenerator().read_and_parse(str(path)))
+
+    assert parallel.input_names == serial.input_names
+    assert parallel.output_names == serial.output_names
+    for name in ["A", "B", "W", "d", "r_init", "x_init"]:
+        assert np.array_equal(getattr(parallel, name), getattr(serial, name)), name
+
+
+def test_optimize_drops_neurons_no_return_depends_on(tmp_path):
+    # the first gate is kept for the signature, but nothing reads it
+    path = tmp_path / "unused.pyres"
+    path.write_text(
+        "\n".join(
+            [
+                "from pyres import std",
+                "def main(a, b, c, d):",
+                "    x = std.nand(a, b)",
+                "    return std.nand(c, d)",
+            ]
+        )
+    )
+    prog = ASTGenerator().read_and_parse(str(path))
+    with pytest.raises(ValueError, match="must have exactly one output"):
+        ASTCompiler().compile(prog)
+
+    compiler = ASTCompiler(optimize=True)
+    res = compiler.compile(prog)
+    nand = Reservoir.load("nand")
+    assert res.A.shape == nand.A.shape
+    assert compiler.opt_reports["main"]["unobservable"]["neurons"] == nand.A.shape[0]
+
+    x = inputs.high_low_inputs(500)
+    signals = np.vstack([x, x])
+    nand.r = np.zeros_like(res.r)  # composites start from rest
+    assert np.allclose(res.run(signals), nand.run(x), atol=1e-4)
+
+
+def test_optimize_merges_repeated_calls(tmp_path):
+    # the second gates repeat the first ones, and so do the gates they feed
+    path = tmp_path / "repeated.pyres"
+    path.write_text(
+        "\n".join(
+            [
+                "from pyres import std",
+                "def main(a, b, c):",
+                "    x = std.nand(a, b)",
+                "    y = std.nand(a, b)",
+                "    return std.nand(x, c), std.nand(y, c)",
+            ]
+        )
+    )
+    prog = ASTGenerator().read_and_parse(str(path))
+    with pytest.raises(ValueError, match="must have exactly one output"):
+        ASTCompiler().compile(prog)
+
+    compiler = ASTCompiler(optimize=True)
+    res = compiler.compile(prog)
+    assert compiler.cse_reports["main"]["reservoirs"] == 2
+    assert res.A.shape[0] == 2 * Reservoir.load("nand").A.shape[0]
+    assert res.W.shape[0] == 2
+
+    path.write_text(
+        "\n".join(
+            ["from pyres import std", "def main(a, b, c):"]
+            + ["    x = std.nand(a, b)", "    return std.nand(x, c)"]
+        )
+    )
+    once = ASTCompiler().compile(ASTGenerator().read_and_parse(str(path)))
+
+    x = inputs.high_low_inputs_3rows(500)
+    y = res.run(x)
+    assert np.array_equal(y[0], y[1])
+    assert np.allclose(y[:1], once.run(x), atol=1e-4)
+
+
+def test_optimize_keeps_output_names_of_merged_calls(tmp_path):
+    # both calls merge, and only outputs 1 and 0 of the lorenz survive
+    path = tmp_path / "lorenz.pyres"
+    path.write_text(
+        "\n".join(
+            [
+                "from pyres import std",
+                "def main():",
+                "    l1, l2, l3 = std.lorenz()",
+                "    m1, m2, m3 = std.lorenz()",
+                "    return l2, m1",
+            ]
+        )
+    )
+    res = ASTCompiler(optimize=True).compile(ASTGenerator().read_and_parse(str(path)))
+    assert res.output_names == ["l2", "m1"]
+
+    lorenz = Reservoir.load("lorenz")
+    lorenz.r = np.zeros_like(lorenz.r)  # composites start from rest
+    expected = lorenz.run(None, time=300)
+    assert np.allclose(res.run(None, time=300), expected[[1, 0]], atol=1e-9)